@@ -0,0 +1,63 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import constant
+from constant import Library_Name
+from main import calculate_metrics, get_all_metric_types
+from src.core.parsing import parse_library
+
+BASELINE_LOG_PATH = os.path.join("log", "baseline_metrics.txt")
+
+
+def calculate_baseline(library_name: Library_Name):
+    # library 하나를 parsing 하고 refactoring 전의 metric 값들을 계산
+    library_path = constant.Target_Library_Path(library_name)
+    if not os.path.exists(library_path):
+        return library_name, None
+
+    # metric 계산만 하므로 class body 없이 summary만 parsing
+    node_container_dict = parse_library(library_path, cache_dir=constant.PARSE_CACHE_DIR, summary=True)
+    metrics = calculate_metrics(node_container_dict, get_all_metric_types())
+
+    return library_name, {metric_type: evaluation.result for metric_type, evaluation in metrics.items()}
+
+
+def calculate_all_baselines(library_names=tuple(Library_Name), workers=constant.BASELINE_WORKERS):
+    # library별로 worker process에서 계산, 결과는 library_names 순서대로 (workers가 None 또는 0이면 serial)
+    if workers:
+        with ProcessPoolExecutor(max_workers=min(workers, len(library_names))) as executor:
+            return dict(executor.map(calculate_baseline, library_names))
+
+    return dict(calculate_baseline(library_name) for library_name in library_names)
+
+
+def format_baseline_table(baselines, metric_types):
+    name_width = max(len(library_name.value) for library_name in baselines)
+    column_width = max(10, max(len(metric_type.value) for metric_type in metric_types))
+
+    lines = [
+        "library".ljust(name_width) + "".join(f" {metric_type.value:>{column_width}}" for metric_type in metric_types)
+    ]
+    for library_name, metric_values in baselines.items():
+        if metric_values is None:
+            lines.append(library_name.value.ljust(name_width) + " (not found)")
+            continue
+
+        lines.append(
+            library_name.value.ljust(name_width) +
+            "".join(f" {metric_values[metric_type]:>{column_width}.6f}" for metric_type in metric_types)
+        )
+
+    return "\n".join(lines) + "\n"
+
+
+if __name__ == '__main__':
+    metric_types = get_all_metric_types()
+    baselines = calculate_all_baselines()
+
+    table = format_baseline_table(baselines, metric_types)
+    print(table)
+
+    os.makedirs(os.path.dirname(BASELINE_LOG_PATH), exist_ok=True)
+    with open(BASELINE_LOG_PATH, "w") as file:
+        file.write(table)
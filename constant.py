@@ -13,6 +13,18 @@ class Library_Name(str, Enum):
 
 DESIRED_REFACTORING_COUNT = 1000
 
+# parse_library에서 사용할 process 수 (None 또는 1이면 serial parsing)
+# worker에서 ast를 pickle로 돌려받는 비용이 parsing보다 커서, target library 크기에서는 serial이 더 빠름
+PARSE_WORKERS = None
+# baseline.py에서 library별 metric 계산에 사용할 process 수 (worker는 작은 metric dict만 돌려줌)
+BASELINE_WORKERS = min(len(Library_Name), os.cpu_count() or 1)
+# parsing 결과를 저장하는 on-disk cache 위치 (None이면 cache 사용 안 함)
+PARSE_CACHE_DIR = ".parse_cache"
+# class별 metric 계산 방식: "python" 또는 "numpy" (numpy 설치 필요, 결과는 같음)
+METRIC_ENGINE = "python"
+# class별 (metric, weight) 값을 저장하는 LRU cache의 최대 class 수 (None이면 cache 사용 안 함)
+METRIC_CACHE_SIZE = 50000
+
 Iteration_Result = namedtuple('Iteration_Result', ['better_metric', 'static_metric', 'worse_metric'])
 Statistics_Unit = namedtuple('Statistics_Unit', ['better_count', 'static_count', 'worse_count'])
 
@@ -71,79 +71,88 @@ def is_class_method_staticmethod(method):
     return class_method_has_decorator(method, "staticmethod")
 
 
-def get_class_methods(cls):
-    """
-    Return methods associated with a given class
-    """
-    return [
-        node
-        for node in cls.body
-        if isinstance(node, ast.FunctionDef)
-    ]
-
-
-def get_class_variables(cls):
-    """
-    Return class variables associated with a given class
-    """
-    return [
-        target
-        for node in cls.body
-        if isinstance(node, ast.Assign)
-        for target in node.targets
-    ]
-
-
-def get_instance_variables(node, bound_name_classifier=BOUND_METHOD_ARGUMENT_NAME):
-    """
-    Return instance variables used in an AST node
-    """
-    node_attributes = [
-        child
-        for child in ast.walk(node)
-        if isinstance(child, ast.Attribute) and
-        get_attribute_name_id(child) == bound_name_classifier
-    ]
-    node_function_call_names = [
-        get_object_name(child)
-        for child in ast.walk(node)
-        if isinstance(child, ast.Call)
-    ]
-    node_instance_variables = [
-        attribute
-        for attribute in node_attributes
-        if get_object_name(attribute) not in node_function_call_names
-    ]
-    return node_instance_variables
-
-
-def get_all_class_variable_names_used_in_method(method):
-    """
-    Return the names of all instance variables associated with a
-    given method
-    """
-    return {
-        get_object_name(variable)
-        for variable in get_instance_variables(method)
-    }
-
-
-def get_all_class_variables(cls):
-    """
-    Return class and instance variables associated with a given class
-    """
-    return get_class_variables(cls) + get_instance_variables(cls)
-
-
-def get_all_class_variable_names(cls):
-    """
-    Return the names of all class and instance variables associated with a
-    given class
-    """
-    return {
-        get_object_name(variable)
-        for variable in get_all_class_variables(cls)
-    }
+class MethodInfo:
+    """
+    Instance variables and calls of a method, collected by collect_class_info
+    """
+    def __init__(self, method):
+        self.method = method
+        self.attribute_names = set()
+        self.call_names = set()
+        # (name, attr) of calls of the form name.attr(...)
+        self.attribute_calls = []
+
+    def get_instance_variable_names(self):
+        """
+        Return the names of the instance variables used in the method, excluding the names
+        which are also called (self.name(...))
+        """
+        return self.attribute_names - self.call_names
+
+
+class ClassInfo:
+    """
+    Everything create_structure needs from a class, collected in one pass over the class
+    """
+    def __init__(self, cls):
+        self.cls = cls
+        self.class_variable_names = set()
+        self.attribute_names = set()
+        self.call_names = set()
+        # methods directly in the class body, in order (including redefinitions)
+        self.methods = []
+        # whether a nested class has the same name as cls
+        self.has_nested_class_with_same_name = False
+
+    def get_variable_names(self):
+        """
+        Return the names of all class and instance variables associated with the class
+        """
+        return self.class_variable_names | (self.attribute_names - self.call_names)
+
+
+def collect_class_info(cls, bound_name_classifier=BOUND_METHOD_ARGUMENT_NAME):
+    """
+    Collect the class variables, the instance variables and calls of the class and of each
+    of its methods with a single traversal of the class
+    """
+    class_info = ClassInfo(cls)
+
+    for node in cls.body:
+        if isinstance(node, ast.Assign):
+            for target in node.targets:
+                class_info.class_variable_names.add(get_object_name(target))
+
+    method_infos = {}
+    for node in cls.body:
+        if isinstance(node, ast.FunctionDef):
+            method_infos[id(node)] = MethodInfo(node)
+            class_info.methods.append(method_infos[id(node)])
+
+    # (node, 속한 method의 MethodInfo)
+    stack = [(cls, None)]
+    while stack:
+        node, method_info = stack.pop()
+
+        if isinstance(node, ast.Attribute):
+            if get_attribute_name_id(node) == bound_name_classifier:
+                class_info.attribute_names.add(node.attr)
+                if method_info is not None:
+                    method_info.attribute_names.add(node.attr)
+        elif isinstance(node, ast.Call):
+            call_name = get_object_name(node)
+            class_info.call_names.add(call_name)
+            if method_info is not None:
+                method_info.call_names.add(call_name)
+                if isinstance(node.func, ast.Attribute) and isinstance(node.func.value, ast.Name):
+                    method_info.attribute_calls.append((node.func.value.id, node.func.attr))
+        elif isinstance(node, ast.ClassDef) and node is not cls and node.name == cls.name:
+            class_info.has_nested_class_with_same_name = True
+
+        for child in ast.iter_child_nodes(node):
+            stack.append((child, method_infos.get(id(child), method_info) if node is cls else method_info))
+
+    return class_info
 
 
 def get_module_classes(node):
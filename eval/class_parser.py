@@ -1,17 +1,16 @@
 import collections
-import operator
 
 import eval.ast_helper.ast_parser as parser
 
 import ast
-from itertools import combinations
-from typing import List, Dict
+from typing import List
 
 class ClassParser:
     def __init__(self, cls):
         self.cls_structure = list(cls.values())[0]
         self.funcs_name = list(self.cls_structure['functions'].keys())
         self.vars_name = self.cls_structure['variables']
+        self._bitmasks = None
 
     def k(self) -> int:
         return len(self.cls_structure["functions"])
@@ -41,93 +40,156 @@ class ClassParser:
     
     def RFC_count(self):
         return self.cls_structure['rfc_count']
-       
-def cau(m1:Dict, m2:Dict) -> int:
-    if len(set(m1['variables']) & set(m2['variables'])) > 0:
-        return 1
-    return 0
-    
-def intersection_of_I(I1:List[str], I2:List[str]) -> List[str]:
-    return list(set(I1) & set(I2))
 
-def union_of_I(I1:List[str], I2:List[str]) -> List[str]:
-    return list(set(I1) | set(I2))
+    def bitmasks(self) -> tuple[tuple[int, ...], int]:
+        # (method별 변수 mask, 전체 변수(A) mask), 처음 계산할 때 저장
+        if self._bitmasks is None:
+            self._bitmasks = build_bitmasks(
+                [self.I(i) for i in range(self.k())],
+                self.A()
+            )
+        return self._bitmasks
 
-def create_structure(file_ast_node):
-    # file_ast_node : ast.classDef
-    module_classes = parser.get_module_classes(file_ast_node)
 
-    result = collections.defaultdict(dict)
+class ClassSummary:
+    """
+    Compact, metrics-only replacement of ClassParser with the same interface.
+    parse_library(summary=True) attaches it to body-less class nodes, so that metric-only runs
+    do not keep the full ast.ClassDef trees alive.
+    """
+    __slots__ = ("funcs_name", "funcs_variables", "vars_name", "cbo_count", "rfc_count", "_bitmasks")
 
-    for module_class in module_classes:
-        class_name = parser.get_object_name(module_class)
+    def __init__(self, cls_parser: ClassParser):
+        self.funcs_name = tuple(cls_parser.funcs_name)
+        self.funcs_variables = tuple(tuple(cls_parser.I(i)) for i in range(cls_parser.k()))
+        self.vars_name = tuple(cls_parser.A())
+        self.cbo_count = cls_parser.CBO_count()
+        self.rfc_count = cls_parser.RFC_count()
+        self._bitmasks = None
 
-        class_variable_names = list(parser.get_all_class_variable_names(module_class))
+    def k(self) -> int:
+        return len(self.funcs_name)
 
-        class_methods = parser.get_class_methods(module_class)
+    def l(self) -> int:
+        return len(self.vars_name)
 
-        class_method_name_to_method = {
-            method.name: method
-            for method in class_methods
-        }
+    def x(self, i) -> int: # x_i
+        return len(self.funcs_variables[i])
 
-        class_method_name_to_variable_names = {
-            method_name: list(parser.get_all_class_variable_names_used_in_method(method))
-            for method_name, method in class_method_name_to_method.items()
+    def M(self): # M_I(c)
+        return {
+            func_name: {'variables': list(variables)}
+            for func_name, variables in zip(self.funcs_name, self.funcs_variables)
         }
 
-        class_method_name_to_boundedness = {
-            method_name: parser.is_class_method_bound(method)
-            for method_name, method in class_method_name_to_method.items()
-        }
+    def I(self, i) -> List[str]: # I_i
+        return list(self.funcs_variables[i])
 
-        class_method_name_to_staticmethodness = {
-            method_name: parser.is_class_method_staticmethod(method)
-            for method_name, method in class_method_name_to_method.items()
-        }
+    def A(self) -> List[str]:
+        return list(self.vars_name)
 
-        class_method_name_to_classmethodness = {
-            method_name: parser.is_class_method_classmethod(method)
-            for method_name, method in class_method_name_to_method.items()
-        }
+    def CBO_count(self):
+        return self.cbo_count
+
+    def RFC_count(self):
+        return self.rfc_count
+
+    def bitmasks(self) -> tuple[tuple[int, ...], int]:
+        # (method별 변수 mask, 전체 변수(A) mask), 처음 계산할 때 저장
+        if self._bitmasks is None:
+            self._bitmasks = build_bitmasks(self.funcs_variables, self.vars_name)
+        return self._bitmasks
 
-        # new: CBO,RFC counting logic
-        referenced_classes = set()
-        referenced_methods = set()
-        for method in class_methods:
-            for node in ast.walk(method):
-                if isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute):
-                    # Check if the call is on an instance or class
-                    if isinstance(node.func.value, ast.Name):
-                        referenced_classes.add(node.func.value.id)
-                        referenced_methods.add(f"{node.func.value.id}.{node.func.attr}")
-        referenced_classes.discard(class_name)
-        referenced_methods = {
-            method for method in referenced_methods
-            if not method.startswith(f"{class_name}.")
-        }
 
-        # Calculate RFC count
-        rfc_count = len(referenced_methods) + len(class_method_name_to_method)
-
-        result[class_name]["cohesion"] = None
-        result[class_name]["lineno"] = module_class.lineno
-        result[class_name]["col_offset"] = module_class.col_offset
-        result[class_name]["variables"] = class_variable_names
-        result[class_name]["functions"] = {
-            method_name: {
-                "variables": class_method_name_to_variable_names[method_name],
-                "bounded": class_method_name_to_boundedness[method_name],
-                "staticmethod": class_method_name_to_staticmethodness[method_name],
-                "classmethod": class_method_name_to_classmethodness[method_name],
-            }
-            for method_name in class_method_name_to_method.keys()
+def build_bitmasks(methods_variables, variables) -> tuple[tuple[int, ...], int]:
+    """
+    Method x attribute incidence as integer bitmasks: one bit per variable name,
+    and for each method the OR of the bits of the variables it uses
+    """
+    bits = {}
+
+    def to_mask(names):
+        mask = 0
+        for name in names:
+            mask |= 1 << bits.setdefault(name, len(bits))
+        return mask
+
+    return tuple(to_mask(names) for names in methods_variables), to_mask(variables)
+
+def create_structure(file_ast_node):
+    # file_ast_node : ast.classDef
+    if isinstance(file_ast_node, ast.ClassDef):
+        module_class = file_ast_node
+        class_info = parser.collect_class_info(module_class)
+        module_classes = [module_class]
+        if class_info.has_nested_class_with_same_name:
+            module_classes = parser.get_module_classes(module_class)
+    else:
+        class_info = None
+        module_classes = parser.get_module_classes(file_ast_node)
+
+    # ast.walk 순서로 같은 이름의 class가 여러 개면 마지막 class의 결과가 남음
+    class_name = parser.get_object_name(module_classes[0])
+    module_class = [cls for cls in module_classes if cls.name == class_name][-1]
+    if class_info is None or class_info.cls is not module_class:
+        class_info = parser.collect_class_info(module_class)
+
+    result = collections.defaultdict(dict)
+
+    class_variable_names = list(class_info.get_variable_names())
+
+    # 같은 이름의 method가 여러 개면 순서는 처음 정의, 값은 마지막 정의를 따름
+    class_method_name_to_method_info = {
+        method_info.method.name: method_info
+        for method_info in class_info.methods
+    }
+
+    # new: CBO,RFC counting logic
+    referenced_classes = set()
+    referenced_methods = set()
+    for method_info in class_info.methods:
+        for value_name, attr in method_info.attribute_calls:
+            referenced_classes.add(value_name)
+            referenced_methods.add(f"{value_name}.{attr}")
+    referenced_classes.discard(class_name)
+    referenced_methods = {
+        method for method in referenced_methods
+        if not method.startswith(f"{class_name}.")
+    }
+
+    # Calculate RFC count
+    rfc_count = len(referenced_methods) + len(class_method_name_to_method_info)
+
+    result[class_name]["cohesion"] = None
+    result[class_name]["lineno"] = module_class.lineno
+    result[class_name]["col_offset"] = module_class.col_offset
+    result[class_name]["variables"] = class_variable_names
+    result[class_name]["functions"] = {
+        method_name: {
+            "variables": list(method_info.get_instance_variable_names()),
+            "bounded": parser.is_class_method_bound(method_info.method),
+            "staticmethod": parser.is_class_method_staticmethod(method_info.method),
+            "classmethod": parser.is_class_method_classmethod(method_info.method),
         }
-        result[class_name]["cbo_count"] = len(referenced_classes)
-        result[class_name]["rfc_count"] = rfc_count
+        for method_name, method_info in class_method_name_to_method_info.items()
+    }
+    result[class_name]["cbo_count"] = len(referenced_classes)
+    result[class_name]["rfc_count"] = rfc_count
 
     return ClassParser(result)
 
+
+def summarize_class(class_node) -> ClassSummary:
+    return ClassSummary(create_structure(class_node))
+
+
+def get_class_parser(class_node) -> ClassParser | ClassSummary:
+    # parse_library(summary=True)로 만든 node는 body 없이 summary만 가지고 있음
+    summary = getattr(class_node, "summary", None)
+    if summary is not None:
+        return summary
+    return create_structure(class_node)
+
 if __name__ == "__main__":
     # Example usage
     source_code = """
@@ -1,5 +1,4 @@
-from eval.class_parser import ClassParser, cau, intersection_of_I, union_of_I, create_structure
-from itertools import combinations
+from eval.class_parser import ClassParser, create_structure
 from MetricType import MetricType
 
 class Metric:
@@ -24,6 +23,8 @@ class Metric:
         else:
             raise ValueError(f"Unsupported metric type: {self.metric_type}")
 
+    # 아래 kernel들은 method별 변수 집합을 bitmask로 보고 AND/OR의 popcount로 계산
+    # (pair 순서와 나눗셈 순서는 set으로 계산하던 때와 같아서 결과가 완전히 같음)
     def _LSCC(self, cls:ClassParser):
         l, k = cls.l(), cls.k()
         if l == 0 and k == 0:
@@ -34,21 +35,24 @@ class Metric:
         elif (l > 0 and k == 0) or k == 1:
             return 1
         else:
+            method_masks, _ = cls.bitmasks()
             result = 0
-            for i in range(k):
-                x_i = cls.x(i)
-                result += x_i
+            for method_mask in method_masks:
+                result += method_mask.bit_count()
             return result/(l*k*(k-1))
         
     def _TCC(self, cls:ClassParser):
-        k, M = cls.k(), cls.M()
+        k = cls.k()
         if k <= 1:
             # print("TCC requires at least two methods")
             return 0
+        method_masks, _ = cls.bitmasks()
         numerator = 0
-        for m1_key, m2_key in combinations(M.keys(), 2):
-            m1, m2 = M[m1_key], M[m2_key]
-            numerator += 1 if cau(m1, m2) else 0
+        for i in range(k-1):
+            mask_i = method_masks[i]
+            for j in range(i+1, k):
+                if mask_i & method_masks[j]:
+                    numerator += 1
         return numerator/ (k * (k-1) / 2)
     
     def _CC(self, cls:ClassParser):
@@ -56,13 +60,15 @@ class Metric:
         if k <= 1:
             # print("CC requires at least two methods")
             return 0
+        method_masks, _ = cls.bitmasks()
+        pair_count = k * (k-1)
         sigma = 0
         for i in range(k-1):
+            mask_i = method_masks[i]
             for j in range(i+1, k):
-                I1, I2 = cls.I(i), cls.I(j)
-                union_of_i = union_of_I(I1, I2)
-                if len(union_of_i) != 0:
-                    sigma += len(intersection_of_I(I1, I2)) / len(union_of_i) / (k * (k-1))
+                union_count = (mask_i | method_masks[j]).bit_count()
+                if union_count != 0:
+                    sigma += (mask_i & method_masks[j]).bit_count() / union_count / pair_count
         return 2 * sigma
     
     def _SCOM(self, cls:ClassParser):
@@ -70,29 +76,33 @@ class Metric:
         if l == 0 or k <= 1:
             # print("SCOM requires at least two methods")
             return 0
+        method_masks, _ = cls.bitmasks()
+        counts = [method_mask.bit_count() for method_mask in method_masks]
+        pair_count = k * (k - 1)
         sigma = 0
         for i in range(k-1):
+            if counts[i] == 0:
+                continue
+            mask_i = method_masks[i]
             for j in range(i+1, k):
-                I1, I2 = cls.I(i), cls.I(j)
-                if len(I1) == 0 or len(I2) == 0:
+                if counts[j] == 0:
                     # print("SCOM requires at least one attributes for each methods")
                     continue
-                sigma += len(intersection_of_I(I1, I2)) * len(union_of_I(I1, I2)) / min(len(I1), len(I2)) / l / (k * (k - 1))
+                intersection_count = (mask_i & method_masks[j]).bit_count()
+                union_count = (mask_i | method_masks[j]).bit_count()
+                sigma += intersection_count * union_count / min(counts[i], counts[j]) / l / pair_count
         return 2 * sigma
 
     def _LCOM5(self, cls:ClassParser):
-        A = cls.A()
         l, k = cls.l(), cls.k()
         if l == 0 or k <= 1:
             # print("LCOM5 requires at least two methods and at least one attribute")
             return 0
+        method_masks, attribute_mask = cls.bitmasks()
+        # 각 attribute를 쓰는 method 수의 합 = 각 method가 쓰는 attribute 수의 합
         sigma = 0
-        for a in A:
-            cnt = 0
-            for i in range(k):
-                if a in cls.I(i):
-                    cnt += 1
-            sigma += cnt
+        for method_mask in method_masks:
+            sigma += (method_mask & attribute_mask).bit_count()
         return (k - sigma / l) / (k - 1)
     
     def _CBO(self, cls: ClassParser):
@@ -0,0 +1,139 @@
+try:
+    import numpy as np
+except ImportError:  # numpy engine을 쓰지 않으면 필요 없음
+    np = None
+
+from eval.class_parser import ClassParser
+from eval.metrics import Metric
+from MetricType import MetricType
+
+# incidence matrix로 계산하는 metric들, 나머지는 Metric을 그대로 사용
+VECTORIZED_METRIC_TYPES = {MetricType.LSCC, MetricType.TCC, MetricType.CC, MetricType.SCOM, MetricType.LCOM5}
+
+
+def is_available() -> bool:
+    return np is not None
+
+
+class IncidenceMatrices:
+    """
+    Boolean method x attribute matrix of a class, with the pairwise intersection and union
+    sizes of the methods' attribute sets computed by matrix products.
+    """
+    def __init__(self, cls: ClassParser):
+        self.k, self.l = cls.k(), cls.l()
+
+        # 열: method들이 쓰는 변수와 A의 변수 (method 변수가 A에 없을 수도 있음)
+        columns = {}
+        for i in range(self.k):
+            for name in cls.I(i):
+                columns.setdefault(name, len(columns))
+        for name in cls.A():
+            columns.setdefault(name, len(columns))
+
+        self.matrix = np.zeros((self.k, len(columns)), dtype=np.int64)
+        for i in range(self.k):
+            for name in cls.I(i):
+                self.matrix[i, columns[name]] = 1
+        self.attribute_vector = np.zeros(len(columns), dtype=np.int64)
+        for name in cls.A():
+            self.attribute_vector[columns[name]] = 1
+
+        self.counts = self.matrix.sum(axis=1)
+        self.intersections = self.matrix @ self.matrix.T
+        self.unions = self.counts[:, None] + self.counts[None, :] - self.intersections
+        # Metric과 같은 (i, j), i < j 순서
+        self.pairs = np.triu_indices(self.k, 1)
+
+    def value(self, metric_type: MetricType):
+        if metric_type == MetricType.LSCC:
+            return self._LSCC()
+        elif metric_type == MetricType.TCC:
+            return self._TCC()
+        elif metric_type == MetricType.CC:
+            return self._CC()
+        elif metric_type == MetricType.SCOM:
+            return self._SCOM()
+        elif metric_type == MetricType.LCOM5:
+            return self._LCOM5()
+        else:
+            raise ValueError(f"Unsupported metric type: {metric_type}")
+
+    @staticmethod
+    def _sum_in_order(terms):
+        # Metric의 loop와 같은 순서로 더해서 float 결과가 같도록 np.sum 대신 cumsum 사용
+        if len(terms) == 0:
+            return 0
+        return float(np.cumsum(terms)[-1])
+
+    def _LSCC(self):
+        l, k = self.l, self.k
+        if l == 0 and k == 0:
+            return 1
+        if l == 0 and k > 1:
+            return 0
+        elif (l > 0 and k == 0) or k == 1:
+            return 1
+        else:
+            return int(self.counts.sum())/(l*k*(k-1))
+
+    def _TCC(self):
+        k = self.k
+        if k <= 1:
+            return 0
+        numerator = int(np.count_nonzero(self.intersections[self.pairs]))
+        return numerator/ (k * (k-1) / 2)
+
+    def _CC(self):
+        k = self.k
+        if k <= 1:
+            return 0
+        intersections, unions = self.intersections[self.pairs], self.unions[self.pairs]
+        nonempty = unions != 0
+        terms = intersections[nonempty] / unions[nonempty] / (k * (k-1))
+        return 2 * self._sum_in_order(terms)
+
+    def _SCOM(self):
+        l, k = self.l, self.k
+        if l == 0 or k <= 1:
+            return 0
+        i, j = self.pairs
+        intersections, unions = self.intersections[self.pairs], self.unions[self.pairs]
+        counts_i, counts_j = self.counts[i], self.counts[j]
+        nonempty = (counts_i != 0) & (counts_j != 0)
+        terms = (
+            intersections[nonempty] * unions[nonempty]
+            / np.minimum(counts_i, counts_j)[nonempty] / l / (k * (k - 1))
+        )
+        return 2 * self._sum_in_order(terms)
+
+    def _LCOM5(self):
+        l, k = self.l, self.k
+        if l == 0 or k <= 1:
+            return 0
+        sigma = int((self.matrix @ self.attribute_vector).sum())
+        return (k - sigma / l) / (k - 1)
+
+
+class VectorizedMetrics:
+    """
+    Metric values of several metric types for a class at once, the cohesion metrics
+    being derived from one IncidenceMatrices of the class. Requires numpy.
+    """
+    def __init__(self, metric_types: list[MetricType]):
+        if not is_available():
+            raise ImportError("The numpy metric engine requires numpy to be installed")
+        self.metric_types = list(metric_types)
+        self.metrics = [Metric(metric_type) for metric_type in self.metric_types]
+
+    def values(self, cls: ClassParser) -> list:
+        matrices = None
+        values = []
+        for metric_type, metric in zip(self.metric_types, self.metrics):
+            if metric_type in VECTORIZED_METRIC_TYPES:
+                if matrices is None:
+                    matrices = IncidenceMatrices(cls)
+                values.append(matrices.value(metric_type))
+            else:
+                values.append(metric.value(cls))
+        return values
@@ -1,10 +1,74 @@
 import ast
+from collections import OrderedDict
 
+import constant
 from eval.metrics import Weight, Metric
-from eval.class_parser import ClassParser, create_structure
+from eval.class_parser import ClassParser, get_class_parser
+from eval import vectorized_metrics
+from eval.vectorized_metrics import VectorizedMetrics
 from src.core.parsing import NodeContainer
 from MetricType import MetricType
 from src.core.parsing import parse_library, get_full_inheritance_dict
+from src.utils.ast_utils import get_fingerprint
+
+METRIC_ENGINES = ("python", "numpy")
+
+
+class ClassMetricCache:
+    """
+    LRU cache of the per-class (metric, weight) values, keyed by the structural fingerprint of
+    the ClassDef, so that classes left unchanged by a refactoring are not evaluated again.
+    """
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        # {fingerprint: {metric_type: (metric, weight)}}, 오래 안 쓴 순서
+        self.entries: OrderedDict[bytes, dict] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, fingerprint: bytes) -> dict | None:
+        values = self.entries.get(fingerprint)
+        if values is not None:
+            self.entries.move_to_end(fingerprint)
+        return values
+
+    def put(self, fingerprint: bytes, values: dict):
+        self.entries[fingerprint] = values
+        self.entries.move_to_end(fingerprint)
+        while len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+
+    def clear(self):
+        self.entries.clear()
+        self.hits = 0
+        self.misses = 0
+
+
+# process 안의 모든 evaluation(main.py의 반복, GA의 individual들)이 공유
+CLASS_METRIC_CACHE = ClassMetricCache(constant.METRIC_CACHE_SIZE) if constant.METRIC_CACHE_SIZE else None
+
+
+def get_class_metric_values(node: ast.ClassDef, metric_types, get_metric_values, weights, cache=CLASS_METRIC_CACHE) -> dict:
+    """{metric_type: (metric, weight)} of a class, from the cache if the class is unchanged"""
+    # summary만 가진 node는 body가 없어서 fingerprint로 구분할 수 없으므로 cache 하지 않음
+    fingerprint = None
+    if cache is not None and getattr(node, "summary", None) is None:
+        fingerprint = get_fingerprint(node)
+
+    values = cache.get(fingerprint) if fingerprint is not None else None
+    if values is not None and all(metric_type in values for metric_type in metric_types):
+        cache.hits += 1
+        return values
+
+    cls_parser = get_class_parser(node)
+    values = dict(values or {})
+    for metric_type, metric_value, weight in zip(metric_types, get_metric_values(cls_parser), weights):
+        values[metric_type] = (metric_value, weight.value(cls_parser))
+
+    if fingerprint is not None:
+        cache.misses += 1
+        cache.put(fingerprint, values)
+    return values
 
 class Evaluation:
     def __init__(self, node_containers, metric_type:MetricType):
@@ -14,6 +78,14 @@ class Evaluation:
         else:
             self.result = self._evaluate_dit(node_containers)
 
+    @classmethod
+    def from_result(cls, metric_type: MetricType, result):
+        # evaluate_metrics에서 미리 계산한 값으로 만듦
+        evaluation = cls.__new__(cls)
+        evaluation.metric_type = metric_type
+        evaluation.result = result
+        return evaluation
+
     def _metric(self, cls_parser:ClassParser):
         return Metric(self.metric_type).value(cls_parser)
     
@@ -23,15 +95,17 @@ class Evaluation:
     def _evaluate(self, node_containers):
         total_weight = 0
         total_metric = 0
+        get_metric_values = lambda cls_parser: [self._metric(cls_parser)]
+        weights = [Weight(self.metric_type)]
         for node_container in node_containers.values():
             node_list = node_container.nodes
             for node in node_list:
                 if not isinstance(node, ast.ClassDef):
                     continue
 
-                cls_parser:ClassParser = create_structure(node)
-                metric = self._metric(cls_parser)
-                weight = self._weight(cls_parser)
+                # 바뀌지 않은 class는 cache된 값을 사용
+                values = get_class_metric_values(node, [self.metric_type], get_metric_values, weights)
+                metric, weight = values[self.metric_type]
                 total_metric += weight * metric
                 total_weight += weight
         return total_metric/total_weight
@@ -80,4 +154,56 @@ class Evaluation:
         return self.result != other.result
 
     def __str__(self):
-        return str(self.result)
\ No newline at end of file
+        return str(self.result)
+
+
+def evaluate_metrics(node_containers, metric_types, engine: str = "python", cache=CLASS_METRIC_CACHE) -> dict[MetricType, Evaluation]:
+    """
+    Same results as {metric_type: Evaluation(node_containers, metric_type)}, but the ClassParser
+    of each class is built only once and shared by all the metric types.
+
+    engine is one of METRIC_ENGINES: "python" (Metric) or "numpy" (VectorizedMetrics, which
+    requires numpy and gives identical results).
+    The per-class values are looked up in / stored to cache (a ClassMetricCache, None to disable).
+    """
+    metric_types = list(dict.fromkeys(metric_types))
+    class_metric_types = [metric_type for metric_type in metric_types if metric_type != MetricType.DIT]
+    weights = [Weight(metric_type) for metric_type in class_metric_types]
+
+    if engine == "numpy":
+        if not vectorized_metrics.is_available():
+            raise ImportError(
+                'The "numpy" metric engine (constant.METRIC_ENGINE) requires numpy, '
+                'install numpy or use the "python" engine'
+            )
+        get_metric_values = VectorizedMetrics(class_metric_types).values
+    elif engine == "python":
+        metrics = [Metric(metric_type) for metric_type in class_metric_types]
+        get_metric_values = lambda cls_parser: [metric.value(cls_parser) for metric in metrics]
+    else:
+        raise ValueError(f"Unsupported metric engine: {engine}, must be one of {METRIC_ENGINES}")
+
+    # metric type별 합은 Evaluation._evaluate와 같은 순서로 더함
+    total_metrics = [0] * len(class_metric_types)
+    total_weights = [0] * len(class_metric_types)
+    if class_metric_types:
+        for node_container in node_containers.values():
+            for node in node_container.nodes:
+                if not isinstance(node, ast.ClassDef):
+                    continue
+
+                # 바뀌지 않은 class는 cache된 값을 사용
+                values = get_class_metric_values(node, class_metric_types, get_metric_values, weights, cache)
+                for idx, metric_type in enumerate(class_metric_types):
+                    metric_value, weight_value = values[metric_type]
+                    total_metrics[idx] += weight_value * metric_value
+                    total_weights[idx] += weight_value
+
+    results = {}
+    for metric_type in metric_types:
+        if metric_type == MetricType.DIT:
+            results[metric_type] = Evaluation(node_containers, metric_type)
+        else:
+            idx = class_metric_types.index(metric_type)
+            results[metric_type] = Evaluation.from_result(metric_type, total_metrics[idx] / total_weights[idx])
+    return results
@@ -1,32 +1,19 @@
-import ast
 import copy
 import os
 from datetime import datetime
 from random import choice, sample, randint, random
-from typing import Type
 
 import constant
 from MetricType import MetricType
 from constant import Library_Name
 from evaluation import Evaluation
 from main import calculate_metrics
-from src.core.parsing import parse_library
-from src.core.refactor import REFACTORING_TYPES, Refactor, InvalidLocationException
+from src.core.parsing import parse_library, get_class_locations
+from src.core.refactor import REFACTORING_TYPES
+from src.core.series import SeriesApplier, StepStatus, Location, Series
 
 selected_library = Library_Name.Arrow
 
-original_node_container_dict = parse_library(constant.Target_Library_Path(selected_library))
-
-Location = tuple[str, int]
-Series = list[tuple[Type[Refactor], Location]]
-
-classes_origin: list[Location] = []
-# collect all classes from library
-for file_path, node_container in original_node_container_dict.items():
-    for idx, node in enumerate(node_container.nodes):
-        if isinstance(node, ast.ClassDef):
-            classes_origin.append((file_path, idx))
-
 TARGET_METRICS = [
     (MetricType.LSCC, 1),
     # (MetricType.LSCC, 1),
@@ -34,15 +21,6 @@ TARGET_METRICS = [
     # (MetricType.RFC, -1)
 ]
 
-INITIAL_METRIC_RESULT = calculate_metrics(
-    original_node_container_dict,
-    [item[0] for item in TARGET_METRICS]
-)
-
-CACHED_FITNESS = {}
-CACHE_HIT = 0
-CACHE_MISS = 0
-
 SERIES_SIZE = 20
 POPULATION_SIZE = 40
 K = 10
@@ -66,57 +44,163 @@ def get_weighted_sum(result: dict[str, Evaluation]):
     return total
 
 
-def fitness(series: Series):
-    global CACHE_HIT, CACHE_MISS
+class GAEngine:
+    """
+    Library-dependent state of the GA (parsed library, class locations, initial metrics and
+    the fitness cache). Nothing is parsed or evaluated until it is first needed, so importing
+    ga.py is instant; worker processes can call load() to initialize explicitly.
+    """
+    def __init__(self, library_name: Library_Name):
+        self.library_name = library_name
+
+        self._original_node_container_dict = None
+        self._classes_origin: list[Location] | None = None
+        self._initial_metric_result = None
+
+        self.cached_fitness = {}
+        self.cache_hit = 0
+        self.cache_miss = 0
+
+    @property
+    def original_node_container_dict(self):
+        if self._original_node_container_dict is None:
+            self._original_node_container_dict = parse_library(
+                constant.Target_Library_Path(self.library_name),
+                workers=constant.PARSE_WORKERS,
+                cache_dir=constant.PARSE_CACHE_DIR
+            )
+        return self._original_node_container_dict
+
+    @property
+    def classes_origin(self) -> list[Location]:
+        if self._classes_origin is None:
+            # collect all classes from library
+            # index 대신 class ID를 사용해서, 앞의 refactoring이 class/import를 추가/삭제해도 같은 class를 가리킴
+            self._classes_origin = get_class_locations(self.original_node_container_dict, as_ids=True)
+        return self._classes_origin
+
+    @property
+    def initial_metric_result(self):
+        if self._initial_metric_result is None:
+            self._initial_metric_result = calculate_metrics(
+                self.original_node_container_dict,
+                [item[0] for item in TARGET_METRICS]
+            )
+        return self._initial_metric_result
+
+    def load(self):
+        self.original_node_container_dict
+        self.classes_origin
+        self.initial_metric_result
+        return self
+
+    def reset_cache_stats(self):
+        self.cache_hit = 0
+        self.cache_miss = 0
+
+    def fitness(self, series: Series):
+        if tuple(series) in self.cached_fitness:
+            self.cache_hit += 1
+            return self.cached_fitness[tuple(series)]
+
+        mean_fitness = 0
+
+        for _ in range(REPEAT_FITNESS):
+            # 원본 library 위에서 바로 적용하고, metric 계산 후 undo로 되돌림
+            applier = SeriesApplier(self.original_node_container_dict, series, clone=False)
+            try:
+                base = applier.apply()
 
-    if tuple(series) in CACHED_FITNESS:
-        CACHE_HIT += 1
-        return CACHED_FITNESS[tuple(series)]
+                for step_idx in applier.get_steps(StepStatus.INVALID_LOCATION):
+                    print("---Can be ignored---")
+                    print(applier.errors[step_idx])
+                    print(f"{series[step_idx][1]} is no longer valid since prior refactorings modify the structure.")
+                    print("---")
 
-    mean_fitness = 0
+                result = calculate_metrics(
+                    base,
+                    [item[0] for item in TARGET_METRICS]
+                )
+            finally:
+                applier.undo()
 
-    for _ in range(REPEAT_FITNESS):
-        node_container_dict = copy.deepcopy(original_node_container_dict)
+            mean_fitness += get_weighted_sum(result)
 
-        base = node_container_dict
-        for refactoring_method, location in series:
-            try:
-                refactor = refactoring_method(base=base, location=location)
-            except InvalidLocationException as e:
-                print("---Can be ignored---")
-                print(e)
-                print(f"{location} is no longer valid since prior refactorings modify the structure.")
-                print("---")
-                continue
-            refactor.do()
-            base = refactor.result
+        mean_fitness /= REPEAT_FITNESS
+
+        print(f"fitness for [{series[0]}...]: {mean_fitness}")
+        self.cached_fitness[tuple(series)] = mean_fitness
+        self.cache_miss += 1
+
+        return mean_fitness
+
+    def get_random_series(self) -> Series:
+        return [
+            (choice(REFACTORING_TYPES), choice(self.classes_origin))
+            for _ in range(SERIES_SIZE)
+        ]
+
+    def select(self, population: list[Series], k):
+        chosen = sample(population, k)
+        return sorted(chosen, key=lambda series: self.fitness(series), reverse=True)[0]
+
+    def mutate(self, c: Series, mutate_rate):
+        mutated_c = copy.deepcopy(c)
+
+        for idx in range(len(mutated_c)):
+            if random() < mutate_rate:
+                mutated_c[idx] = (choice(REFACTORING_TYPES), choice(self.classes_origin))
+
+        return mutated_c
 
-        result = calculate_metrics(
-            base,
-            [item[0] for item in TARGET_METRICS]
-        )
+    def save_result(self, series: Series, last_gens: int, start_date: datetime):
+        ga_log_dir = "log/ga"
+        os.makedirs(ga_log_dir, exist_ok=True)
 
-        mean_fitness += get_weighted_sum(result)
+        with open(os.path.join(ga_log_dir, f"{LOG_FILE_NAME}_{SUFFIX}.txt"), "w") as f:
+            # Metric
+            f.write(f"Metrics: {', '.join([f'{str(item[1])} * {str(item[0])}' for item in TARGET_METRICS])}\n")
 
-    mean_fitness /= REPEAT_FITNESS
+            # Parameters
+            f.write(f"Series size: {SERIES_SIZE}\n")
+            f.write(f"Population size: {POPULATION_SIZE}\n")
+            f.write(f"K: {K}\n")
+            f.write(f"Mutation rate: {MUTATION_RATE}\n")
+            f.write(f"Max generations: {MAX_GENS}\n")
+            f.write(f"Actual generations: {last_gens}\n")
+            f.write(f"Repeat fitness: {REPEAT_FITNESS}\n")
 
-    print(f"fitness for [{series[0]}...]: {mean_fitness}")
-    CACHED_FITNESS[tuple(series)] = mean_fitness
-    CACHE_MISS += 1
+            f.write(f"Start date: {start_date}\n")
+            f.write(f"End date: {datetime.now()}\n")
 
-    return mean_fitness
+            f.write("Series=================================================================================\n")
+            for item in series:
+                f.write(f"{item}\n")
+            f.write("=======================================================================================\n")
+
+            f.write(f"Before Refactoring: {get_weighted_sum(self.initial_metric_result)}\n")
+            f.write(f"After Refactoring: {self.fitness(series)}\n")
+
+
+ENGINES: dict[Library_Name, GAEngine] = {}
+
+
+def get_engine(library_name: Library_Name = selected_library) -> GAEngine:
+    if library_name not in ENGINES:
+        ENGINES[library_name] = GAEngine(library_name)
+    return ENGINES[library_name]
+
+
+def fitness(series: Series):
+    return get_engine().fitness(series)
 
 
 def get_random_series() -> Series:
-    return [
-        (choice(REFACTORING_TYPES), choice(classes_origin))
-        for _ in range(SERIES_SIZE)
-    ]
+    return get_engine().get_random_series()
 
 
 def select(population: list[Series], k):
-    chosen = sample(population, k)
-    return sorted(chosen, key=lambda series: fitness(series), reverse=True)[0]
+    return get_engine().select(population, k)
 
 
 def crossover(p1: Series, p2: Series):
@@ -127,42 +211,11 @@ def crossover(p1: Series, p2: Series):
 
 
 def mutate(c: Series, mutate_rate):
-    mutated_c = copy.deepcopy(c)
-
-    for idx in range(len(mutated_c)):
-        if random() < mutate_rate:
-            mutated_c[idx] = (choice(REFACTORING_TYPES), choice(classes_origin))
-
-    return mutated_c
+    return get_engine().mutate(c, mutate_rate)
 
 
 def save_result(series: Series, last_gens: int, start_date: datetime):
-    ga_log_dir = "log/ga"
-    os.makedirs(ga_log_dir, exist_ok=True)
-
-    with open(os.path.join(ga_log_dir, f"{LOG_FILE_NAME}_{SUFFIX}.txt"), "w") as f:
-        # Metric
-        f.write(f"Metrics: {', '.join([f'{str(item[1])} * {str(item[0])}' for item in TARGET_METRICS])}\n")
-
-        # Parameters
-        f.write(f"Series size: {SERIES_SIZE}\n")
-        f.write(f"Population size: {POPULATION_SIZE}\n")
-        f.write(f"K: {K}\n")
-        f.write(f"Mutation rate: {MUTATION_RATE}\n")
-        f.write(f"Max generations: {MAX_GENS}\n")
-        f.write(f"Actual generations: {last_gens}\n")
-        f.write(f"Repeat fitness: {REPEAT_FITNESS}\n")
-
-        f.write(f"Start date: {start_date}\n")
-        f.write(f"End date: {datetime.now()}\n")
-
-        f.write("Series=================================================================================\n")
-        for item in series:
-            f.write(f"{item}\n")
-        f.write("=======================================================================================\n")
-
-        f.write(f"Before Refactoring: {get_weighted_sum(INITIAL_METRIC_RESULT)}\n")
-        f.write(f"After Refactoring: {fitness(series)}\n")
+    get_engine().save_result(series, last_gens, start_date)
 
 
 
@@ -202,9 +255,9 @@ if __name__ == '__main__':
             else:
                 print("Generation " + str(gens))
 
-            print(f"fitness cache hit: {CACHE_HIT}, miss: {CACHE_MISS} for Generation {gens}.")
-            CACHE_HIT = 0
-            CACHE_MISS = 0
+            engine = get_engine()
+            print(f"fitness cache hit: {engine.cache_hit}, miss: {engine.cache_miss} for Generation {gens}.")
+            engine.reset_cache_stats()
     # except KeyboardInterrupt:
     #     print("suspended")
     finally:
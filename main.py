@@ -1,14 +1,13 @@
-import ast
 from random import shuffle
 from typing import List, Dict
 
-from src.core.parsing import parse_library
-from src.core.refactor import REFACTORING_TYPES
+from src.core.applicability import ApplicabilityIndex
+from src.core.parsing import parse_library, get_class_locations
 import constant
 from constant import Iteration_Result, Statistics_Unit, DESIRED_REFACTORING_COUNT, Library_Name
 from constant import Better_Idx, Static_Idx, Worse_Idx
 from constant import Agreement_Idx, Dissonant_Idx, Conflicted_Idx
-from evaluation import Evaluation
+from evaluation import evaluate_metrics
 from MetricType import MetricType
 from util import printf, Log_Save_Path
 import os
@@ -36,11 +35,10 @@ def get_all_metric_types():
         metric_types.append(metric_Type)
     return metric_types
 
-def calculate_metrics(node_container_dict, metric_type_list):
-    result = {}
-    for metric_type in metric_type_list:
-        result[metric_type] = Evaluation(node_container_dict, metric_type)
-    return result
+def calculate_metrics(node_container_dict, metric_type_list, engine=None):
+    # class마다 ClassParser를 한 번만 만들어서 모든 metric에 사용
+    # engine을 주지 않으면 constant.METRIC_ENGINE 사용
+    return evaluate_metrics(node_container_dict, metric_type_list, engine or constant.METRIC_ENGINE)
 
 def compare_metrics(metrics_dict_before, metrics_dict_after):
     iteration_result = Iteration_Result({}, {}, {})
@@ -120,14 +118,17 @@ def check_conflicted_refactoring(iteration_result: Iteration_Result, improve_che
 if __name__ == '__main__':
     # Target Library 설정 
     selected_library = Library_Name.Arrow
-    node_container_dict = parse_library(constant.Target_Library_Path(selected_library))
+    node_container_dict = parse_library(
+        constant.Target_Library_Path(selected_library),
+        workers=constant.PARSE_WORKERS,
+        cache_dir=constant.PARSE_CACHE_DIR
+    )
     
-    classes_origin = []
-    # collect all classes from library
-    for file_path, node_container in node_container_dict.items():
-        for idx, node in enumerate(node_container.nodes):
-            if isinstance(node, ast.ClassDef):
-                classes_origin.append((file_path, idx))
+    # collect all classes from library, as class IDs ("file_path:ClassName")
+    classes_origin = get_class_locations(node_container_dict, as_ids=True)
+
+    # class별로 가능한 refactoring type들을 한 번만 계산 (library는 매 시도 후 되돌리므로 갱신 불필요)
+    applicability_index = ApplicabilityIndex(node_container_dict)
 
     # Metric Types 설정
     metric_types = get_all_metric_types()
@@ -168,13 +169,13 @@ if __name__ == '__main__':
             classes = classes_origin.copy()
             while(len(classes) > 0 and is_finish_cycle(refactoring_count) == False):
                 target_class = classes.pop()
-                refactoring_methods = REFACTORING_TYPES.copy()
+                refactoring_methods = applicability_index.get_feasible_types(target_class).copy()
                 shuffle(refactoring_methods) # refactoring methods 랜덤 순서 섞기
                 while(len(refactoring_methods) > 0 and is_finish_cycle(refactoring_count) == False):
                     refactoring_method = refactoring_methods.pop()
-                    refactor = refactoring_method(base=node_container_dict, location=target_class)
-                    if refactor.is_possible():
-                        refactor.do() # refactoring 진행
+                    # library를 복사하지 않고 직접 수정한 뒤, 평가가 끝나면 journal로 되돌림
+                    refactor = refactoring_method(base=node_container_dict, location=target_class, in_place=True)
+                    if refactor.do(): # refactoring 진행, 불가능하거나 중간에 중단되면 False
                         try_count+=1
                         metrics_before = metrics_origin if is_first else metrics_before
                         metrics_after = calculate_metrics(refactor.result, metric_types)
@@ -182,6 +183,7 @@ if __name__ == '__main__':
                         # refactoring 성공 여부 확인
                         if(fitness_function_improves(iteration_result, metric_types_for_refactoring_check)):
                             print(f"{refactoring_count}th Refactoring_Success: {refactoring_method}")
+                            print(refactor.change_set)
                             is_first = False
                             result_logs.append(iteration_result)
                             refactoring_count+=1
@@ -226,8 +228,8 @@ if __name__ == '__main__':
                                     metric_values += f"{iteration_result.worse_metric[metric_type].result}, "
                             metric_values += "\n"
                             file.write(metric_values)
-                        else:
-                            refactor.undo()
+                        # 매 시도는 항상 원래 library에 대해 수행
+                        refactor.undo()
                         if(try_count%100 == 0):
                             print(f"We tried {try_count} times and succeed {refactoring_count} times")
                             print(f"classes remains {len(classes)} and refactoring_methods remains {len(refactoring_methods)}")
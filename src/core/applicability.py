@@ -0,0 +1,92 @@
+from src.core.parsing import Library, get_class_locations, get_hierarchy_graph
+from src.core.refactor import REFACTORING_TYPES, ChangeSet, ReplaceDelegationWithInheritance
+
+
+class ApplicabilityIndex:
+    """
+    is_possible() of every (refactoring type, class ID) pair of a library, computed once.
+    After a refactoring is kept, update() re-checks only the classes it may have affected.
+    """
+    def __init__(self, library: Library, refactoring_types=REFACTORING_TYPES):
+        self.library = library
+        self.refactoring_types = list(refactoring_types)
+        # {"file1:Class1": [refactoring types]}, REFACTORING_TYPES 순서 유지
+        self.feasible_types: dict[str, list] = {}
+
+        for class_id in get_class_locations(library, as_ids=True):
+            self._check(class_id)
+
+    def _check(self, class_id: str, refactoring_types=None):
+        if refactoring_types is None:
+            refactoring_types = self.refactoring_types
+
+        # 다시 확인하지 않는 type들의 결과는 그대로 둠
+        feasible = {
+            refactoring_type
+            for refactoring_type in self.get_feasible_types(class_id)
+            if refactoring_type not in refactoring_types
+        }
+        for refactoring_type in refactoring_types:
+            # refactoring을 만들지 않고 공유 library에서 바로 확인
+            if refactoring_type.can_apply(self.library, class_id):
+                feasible.add(refactoring_type)
+
+        feasible_types = [
+            refactoring_type
+            for refactoring_type in self.refactoring_types
+            if refactoring_type in feasible
+        ]
+        if feasible_types:
+            self.feasible_types[class_id] = feasible_types
+        else:
+            self.feasible_types.pop(class_id, None)
+
+    def get_feasible_types(self, class_id: str) -> list:
+        return self.feasible_types.get(class_id, [])
+
+    def is_possible(self, refactoring_type, class_id: str) -> bool:
+        return refactoring_type in self.get_feasible_types(class_id)
+
+    def candidates(self) -> list[tuple[str, type]]:
+        return [
+            (class_id, refactoring_type)
+            for class_id, feasible_types in self.feasible_types.items()
+            for refactoring_type in feasible_types
+        ]
+
+    def update(self, change_set: ChangeSet):
+        """Re-check the classes touched by a kept refactoring, and their parents and children"""
+        graph = get_hierarchy_graph(self.library)
+
+        for file_path, class_name in change_set.deleted:
+            self.feasible_types.pop(f"{file_path}:{class_name}", None)
+
+        affected = dict.fromkeys(
+            f"{file_path}:{class_name}"
+            for file_path, class_name in change_set.writable + change_set.created
+        )
+        # import가 추가된 file은 alias가 바뀌므로 file의 class 전부
+        imported = set(change_set.imported)
+        affected.update(dict.fromkeys(
+            class_id
+            for class_id in get_class_locations(self.library, as_ids=True)
+            if class_id.rsplit(":", 1)[0] in imported
+        ))
+        for class_id in list(affected):
+            class_name = class_id.rsplit(":", 1)[1]
+            affected.update(dict.fromkeys(graph.get_classes(graph.parents.get(class_id, []))))
+            affected.update(dict.fromkeys(graph.get_children(class_name)))
+        for _, class_name in change_set.deleted:
+            affected.update(dict.fromkeys(graph.get_children(class_name)))
+
+        for class_id in affected:
+            if class_id in graph.ranks:
+                self._check(class_id)
+            else:
+                self.feasible_types.pop(class_id, None)
+
+        # delegation은 library 전체의 class 이름으로 판단하므로, class가 생기거나 없어지면 전부 다시 확인
+        if (change_set.created or change_set.deleted) and ReplaceDelegationWithInheritance in self.refactoring_types:
+            for class_id in get_class_locations(self.library, as_ids=True):
+                if class_id not in affected:
+                    self._check(class_id, [ReplaceDelegationWithInheritance])
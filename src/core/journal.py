@@ -0,0 +1,122 @@
+_MISSING = object()
+
+
+class Journal:
+    """
+    Records in-place mutations of ast nodes, node lists and containers, so that a refactoring
+    can be undone by replaying the inverse operations in reverse order.
+    """
+    def __init__(self):
+        self.entries: list[tuple] = []
+
+    def record(self, undo_function, *args):
+        # 임의의 되돌리기 동작을 기록 (index 갱신 등)
+        self.entries.append((undo_function, args))
+
+    def set_attr(self, obj, name: str, value):
+        self.record(_restore_attr, obj, name, getattr(obj, name, _MISSING))
+        setattr(obj, name, value)
+
+    def del_attr(self, obj, name: str):
+        self.record(_restore_attr, obj, name, getattr(obj, name, _MISSING))
+        delattr(obj, name)
+
+    def set_item(self, container, key, value):
+        old_value = container[key] if not isinstance(container, dict) or key in container else _MISSING
+        self.record(_restore_item, container, key, old_value)
+        container[key] = value
+
+    def pop_item(self, container: dict, key):
+        # 되돌릴 때 원래 순서대로 돌아가도록 key의 위치도 기록
+        position = list(container).index(key)
+        value = container.pop(key)
+        self.record(_insert_dict_item, container, position, key, value)
+        return value
+
+    def insert(self, items: list, idx: int, item):
+        # list.insert와 같은 방식으로 실제 위치를 계산
+        if idx < 0:
+            idx = max(0, len(items) + idx)
+        idx = min(idx, len(items))
+        self.record(_delete_item, items, idx)
+        items.insert(idx, item)
+
+    def append(self, items: list, item):
+        self.insert(items, len(items), item)
+
+    def pop(self, items: list, idx: int = -1):
+        if idx < 0:
+            idx += len(items)
+        item = items.pop(idx)
+        self.record(_insert_item, items, idx, item)
+        return item
+
+    def remove(self, items: list, item):
+        for idx, value in enumerate(items):
+            if value is item or value == item:
+                return self.pop(items, idx)
+        raise ValueError(f"{item} is not in list")
+
+    def replace_list(self, items: list, new_items: list):
+        self.record(_restore_list, items, list(items))
+        items[:] = new_items
+
+    def rollback(self):
+        while self.entries:
+            undo_function, args = self.entries.pop()
+            undo_function(*args)
+
+    def __len__(self):
+        return len(self.entries)
+
+
+class NullJournal(Journal):
+    """Journal which applies mutations without recording them"""
+    def record(self, undo_function, *args):
+        pass
+
+    def pop_item(self, container: dict, key):
+        return container.pop(key)
+
+
+NULL_JOURNAL = NullJournal()
+
+
+def _restore_attr(obj, name, value):
+    if value is _MISSING:
+        if hasattr(obj, name):
+            delattr(obj, name)
+    else:
+        setattr(obj, name, value)
+
+
+def _restore_item(container, key, value):
+    if value is _MISSING:
+        container.pop(key, None)
+    else:
+        container[key] = value
+
+
+def _insert_dict_item(container, position, key, value):
+    if position >= len(container):
+        container[key] = value
+        return
+
+    # dict에는 중간 삽입이 없으므로 뒤쪽 item들을 다시 넣음
+    items = list(container.items())
+    container.clear()
+    container.update(items[:position])
+    container[key] = value
+    container.update(items[position:])
+
+
+def _delete_item(items, idx):
+    del items[idx]
+
+
+def _insert_item(items, idx, item):
+    items.insert(idx, item)
+
+
+def _restore_list(items, old_items):
+    items[:] = old_items
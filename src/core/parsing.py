@@ -1,10 +1,23 @@
 import ast
+import copy
+import hashlib
 import os
+import pickle
+import re
 import sys
+import tarfile
+import zipfile
+from bisect import bisect_right, insort
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
 from pprint import pprint
 
+from src.core.journal import Journal, NULL_JOURNAL
+
 IGNORE_PYTHON_FILE = ["__init__.py", "__main__.py"]
 ENCODING = "utf-8"
+# cache에 저장되는 형식이 바뀌면 올려서 기존 cache를 무효화
+PARSE_CACHE_VERSION = 1
 
 
 class NodeContainer:
@@ -12,48 +25,605 @@ class NodeContainer:
         self.nodes: list[ast.ClassDef | ast.Import | ast.ImportFrom] = []
         self.metric = None
         self.aliases: list[ast.alias] = []
+        # {"asname": "name"}, kept in sync with aliases for O(1) lookup
+        self.alias_map: dict[str, str] = {}
         # self.refactored = False
 
         # {"file1.Class1": ["file1.Parent1", "file2.Parent1"]}
         self.inheritance_dict: dict[str, list[str]] = {}
 
+    def add_alias(self, alias: ast.alias, journal: Journal = NULL_JOURNAL):
+        journal.append(self.aliases, alias)
+        # 같은 asname이 여러 번 나오면 먼저 나온 alias를 사용
+        if alias.asname is not None and alias.asname not in self.alias_map:
+            journal.set_item(self.alias_map, alias.asname, alias.name)
+
+    def insert_import(self, idx: int, import_node: ast.Import | ast.ImportFrom, journal: Journal = NULL_JOURNAL):
+        journal.insert(self.nodes, idx, import_node)
+        for alias in import_node.names:
+            self.add_alias(alias, journal)
+
     def lookup_alias(self, class_name: str):
         # Find the original class name which may be aliased
-        for alias in self.aliases:
-            if alias.asname is None:
+        return self.alias_map.get(class_name, class_name)
+
+    def outline(self) -> list[ast.ClassDef | ast.Import | ast.ImportFrom]:
+        # class 이름, base, import만 필요할 때 사용 (LazyNodeContainer에서 body를 parsing하지 않음)
+        return self.nodes
+
+    def copy(self):
+        # list/dict만 새로 만들고 node들은 공유 (copy-on-write snapshot 용)
+        node_container = copy.copy(self)
+        node_container.nodes = list(self.nodes)
+        node_container.aliases = list(self.aliases)
+        node_container.alias_map = dict(self.alias_map)
+        node_container.inheritance_dict = dict(self.inheritance_dict)
+        return node_container
+
+
+class LazyNodeContainer(NodeContainer):
+    """
+    NodeContainer which only keeps the outline of the file (class names, bases and imports)
+    until nodes is accessed for the first time, at which point the file is fully parsed.
+    The full parse is shared with the copies of the container, so a file is parsed at most once.
+    """
+    def __init__(self, source, cache_dir: str | None = None):
+        super().__init__()
+        # file path, or (archive_path, member_name) for libraries parsed from an archive
+        self.source = source
+        self.cache_dir = cache_dir
+        self.outline_nodes: list[ast.ClassDef | ast.Import | ast.ImportFrom] = []
+        self._nodes = None
+        # copy들과 공유하는 parsing 결과, 처음 parsing 한 container가 [nodes]로 채움
+        self._parsed_nodes: list[list[ast.ClassDef | ast.Import | ast.ImportFrom]] = []
+
+    @property
+    def nodes(self):
+        if self._nodes is None:
+            if not self._parsed_nodes:
+                self._parsed_nodes.append(_load_nodes(self.source, self.cache_dir))
+            # list는 container마다 따로, node들은 copy-on-write로 공유
+            self._nodes = list(self._parsed_nodes[0])
+            self.outline_nodes = []
+        return self._nodes
+
+    @nodes.setter
+    def nodes(self, nodes):
+        self._nodes = nodes
+
+    def is_loaded(self):
+        return self._nodes is not None
+
+    def outline(self):
+        return self._nodes if self.is_loaded() else self.outline_nodes
+
+    def copy(self):
+        if self.is_loaded():
+            return super().copy()
+
+        # 아직 parsing 하지 않은 file은 outline과 parsing 결과를 공유
+        node_container = copy.copy(self)
+        node_container.aliases = list(self.aliases)
+        node_container.alias_map = dict(self.alias_map)
+        node_container.inheritance_dict = dict(self.inheritance_dict)
+        return node_container
+
+
+def create_class_outline(class_node: ast.ClassDef) -> ast.ClassDef:
+    # body 없이 이름, base, keyword만 남긴 ClassDef
+    return ast.ClassDef(
+        name=class_node.name,
+        bases=class_node.bases,
+        keywords=class_node.keywords,
+        body=[],
+        decorator_list=[]
+    )
+
+
+def get_base_names(class_node: ast.ClassDef) -> list[str]:
+    from src.utils.ast_utils import get_valid_bases, get_str_bases
+    return list(get_str_bases(get_valid_bases(class_node)))
+
+
+def get_parent_names(node_container: NodeContainer, class_node: ast.ClassDef) -> list[str]:
+    # base 이름을 file의 alias로 풀어서 반환 (중복 제거)
+    return list(dict.fromkeys(node_container.lookup_alias(base) for base in get_base_names(class_node)))
+
+
+def find_class_node(node_container: NodeContainer, class_name: str):
+    for node in node_container.outline():
+        if isinstance(node, ast.ClassDef) and node.name == class_name:
+            return node
+    return None
+
+
+class ClassIndex:
+    """Library-wide symbol index from a class name to the classes defined with that name"""
+    def __init__(self):
+        # {"Class1": ["file1:Class1", "file2:Class1"]}
+        self.locations: dict[str, list[str]] = {}
+        # {"file1:Class1": ["Parent1"]}, base names as written in the class definition
+        self.base_names: dict[str, list[str]] = {}
+        # {"Parent1": {"file1:Class1"}}, classes which write the name as one of their bases
+        self.referrers: dict[str, set[str]] = {}
+
+    def add(self, file_path: str, class_node: ast.ClassDef, journal: Journal = NULL_JOURNAL):
+        locations = self.locations.get(class_node.name)
+        if locations is None:
+            locations = []
+            journal.set_item(self.locations, class_node.name, locations)
+        journal.append(locations, f"{file_path}:{class_node.name}")
+        self.update_bases(file_path, class_node, journal)
+
+    def remove(self, file_path: str, class_name: str, journal: Journal = NULL_JOURNAL):
+        locations = self.locations.get(class_name, [])
+        class_name_with_path = f"{file_path}:{class_name}"
+        if class_name_with_path in locations:
+            journal.remove(locations, class_name_with_path)
+            if not locations:
+                journal.pop_item(self.locations, class_name)
+
+        if class_name_with_path not in locations and class_name_with_path in self.base_names:
+            self._remove_referrer(class_name_with_path)
+            journal.record(self._add_referrer, class_name_with_path)
+            journal.pop_item(self.base_names, class_name_with_path)
+
+    def update_bases(self, file_path: str, class_node: ast.ClassDef, journal: Journal = NULL_JOURNAL):
+        class_name_with_path = f"{file_path}:{class_node.name}"
+        journal.record(self.set_base_names, class_name_with_path, self.base_names.get(class_name_with_path))
+        self.set_base_names(class_name_with_path, get_base_names(class_node))
+
+    def set_base_names(self, class_name_with_path: str, base_names: list[str] | None):
+        self._remove_referrer(class_name_with_path)
+        if base_names is None:
+            self.base_names.pop(class_name_with_path, None)
+            return
+
+        self.base_names[class_name_with_path] = base_names
+        self._add_referrer(class_name_with_path)
+
+    def _add_referrer(self, class_name_with_path: str):
+        for base_name in self.base_names[class_name_with_path]:
+            self.referrers.setdefault(base_name, set()).add(class_name_with_path)
+
+    def _remove_referrer(self, class_name_with_path: str):
+        for base_name in self.base_names.get(class_name_with_path, []):
+            referrers = self.referrers.get(base_name)
+            if referrers is not None:
+                referrers.discard(class_name_with_path)
+                if not referrers:
+                    del self.referrers[base_name]
+
+    def lookup(self, class_names: list[str]) -> list[str]:
+        results = []
+        for class_name in dict.fromkeys(class_names):
+            results.extend(self.locations.get(class_name, []))
+        return results
+
+    def copy(self):
+        class_index = ClassIndex()
+        class_index.locations = {
+            class_name: list(locations)
+            for class_name, locations in self.locations.items()
+        }
+        # base_names의 값은 통째로 교체되므로 공유해도 됨
+        class_index.base_names = dict(self.base_names)
+        class_index.referrers = {
+            base_name: set(referrers)
+            for base_name, referrers in self.referrers.items()
+        }
+        return class_index
+
+
+def build_class_index(node_container_dict: dict[str, NodeContainer]) -> ClassIndex:
+    class_index = ClassIndex()
+    for file_path, node_container in node_container_dict.items():
+        for node in node_container.outline():
+            if isinstance(node, ast.ClassDef):
+                class_index.add(file_path, node)
+    return class_index
+
+
+class HierarchyGraph:
+    """
+    Parent/child adjacency between the classes of a library, keyed by "file_path:ClassName".
+    A class is a child of every class named by its bases, resolved through the aliases of its
+    file. Every adjacency list is kept in library order (file order, then position in the file).
+    """
+    def __init__(self):
+        self.file_ranks: dict[str, int] = {}
+        # {"file1:Class1": (file 순서, file 내 위치)}, 새 class는 앞뒤 class 사이의 위치를 받음
+        self.ranks: dict[str, tuple[int, float]] = {}
+        # {"file1:Class1": ["Parent1", "Parent2"]}
+        self.parents: dict[str, list[str]] = {}
+        # {"Parent1": ["file1:Class1", "file2:Class1"]}
+        self.children: dict[str, list[str]] = {}
+        # {"Class1": ["file1:Class1", "file2:Class1"]}
+        self.classes: dict[str, list[str]] = {}
+
+    def set_class(self, class_name_with_path: str, rank: tuple[int, float] | None, parent_names: list[str] | None):
+        """Add or update a class, or remove it when rank is None"""
+        self._unlink(class_name_with_path)
+        if rank is None:
+            self.ranks.pop(class_name_with_path, None)
+            self.parents.pop(class_name_with_path, None)
+            return
+
+        # 이미 있는 class는 ranks, parents에서 원래 위치를 유지
+        self.ranks[class_name_with_path] = rank
+        self.parents[class_name_with_path] = parent_names
+        self._link(class_name_with_path)
+
+    def _link(self, class_name_with_path: str):
+        class_name = class_name_with_path.rsplit(":", 1)[1]
+        insort(self.classes.setdefault(class_name, []), class_name_with_path, key=self.ranks.__getitem__)
+        for parent_name in self.parents[class_name_with_path]:
+            insort(self.children.setdefault(parent_name, []), class_name_with_path, key=self.ranks.__getitem__)
+
+    def _unlink(self, class_name_with_path: str):
+        parent_names = self.parents.get(class_name_with_path)
+        if parent_names is None:
+            return
+
+        _discard_from(self.classes, class_name_with_path.rsplit(":", 1)[1], class_name_with_path)
+        for parent_name in parent_names:
+            _discard_from(self.children, parent_name, class_name_with_path)
+
+    def refresh(
+            self,
+            node_container_dict: dict[str, NodeContainer],
+            file_path: str,
+            class_name: str,
+            journal: Journal = NULL_JOURNAL
+    ):
+        """Recompute the parents of a class after it was added, removed or re-based"""
+        class_name_with_path = f"{file_path}:{class_name}"
+
+        node_container = node_container_dict[file_path]
+        parent_names = None
+        for node in node_container.outline():
+            if isinstance(node, ast.ClassDef) and node.name == class_name:
+                if parent_names is None:
+                    parent_names = {}
+                parent_names.update(dict.fromkeys(get_parent_names(node_container, node)))
+
+        if parent_names is None:
+            if class_name_with_path in self.ranks:
+                # undo 때 ranks, parents의 원래 위치에 다시 넣은 뒤 adjacency를 복구
+                self._unlink(class_name_with_path)
+                journal.record(self._link, class_name_with_path)
+                journal.pop_item(self.parents, class_name_with_path)
+                journal.pop_item(self.ranks, class_name_with_path)
+            return
+
+        journal.record(
+            self.set_class,
+            class_name_with_path,
+            self.ranks.get(class_name_with_path),
+            self.parents.get(class_name_with_path)
+        )
+        rank = self.ranks.get(class_name_with_path)
+        if rank is None:
+            rank = self._get_new_rank(node_container, file_path, class_name)
+        self.set_class(class_name_with_path, rank, list(parent_names))
+
+    def _get_new_rank(self, node_container: NodeContainer, file_path: str, class_name: str):
+        # 같은 file에서 바로 앞/뒤에 있는 class의 rank 사이 값
+        previous_rank = next_rank = None
+        found = False
+        for node in node_container.outline():
+            if not isinstance(node, ast.ClassDef):
+                continue
+            if node.name == class_name:
+                found = True
                 continue
 
-            if alias.asname == class_name:
-                return alias.name
+            rank = self.ranks.get(f"{file_path}:{node.name}")
+            if rank is None:
+                continue
+            if not found:
+                previous_rank = rank[1]
+            elif next_rank is None:
+                next_rank = rank[1]
 
-        return class_name
+        if previous_rank is None and next_rank is None:
+            position = 0.0
+        elif previous_rank is None:
+            position = next_rank - 1
+        elif next_rank is None:
+            position = previous_rank + 1
+        else:
+            position = (previous_rank + next_rank) / 2
+        return self.file_ranks[file_path], position
 
+    def get_children(self, class_name: str) -> list[str]:
+        return self.children.get(class_name, [])
 
-def get_class_names_with_path(node_container_dict: dict[str, NodeContainer], class_names: list[str]):
-    results = []
+    def get_classes(self, class_names: list[str]) -> list[str]:
+        class_names_with_path = list(dict.fromkeys(
+            class_name_with_path
+            for class_name in class_names
+            for class_name_with_path in self.classes.get(class_name, [])
+        ))
+        if len(class_names) > 1:
+            class_names_with_path.sort(key=self.ranks.__getitem__)
+        return class_names_with_path
+
+    def get_descendants(self, class_name: str) -> list[str]:
+        # 자식들을 먼저 넣고 자식마다 재귀적으로 내려감, 이미 방문한 이름은 다시 보지 않음
+        descendants = {}
+        visited = {class_name}
+
+        def visit(current_name):
+            children = self.get_children(current_name)
+            descendants.update(dict.fromkeys(children))
+            for child in children:
+                child_name = child.rsplit(":", 1)[1]
+                if child_name not in visited:
+                    visited.add(child_name)
+                    visit(child_name)
+
+        visit(class_name)
+        return list(descendants)
+
+    def get_ancestors(self, class_name_with_path: str) -> list[str]:
+        ancestors = {}
+        queue = [class_name_with_path]
+        while queue:
+            for parent in self.get_classes(self.parents.get(queue.pop(0), [])):
+                if parent not in ancestors and parent != class_name_with_path:
+                    ancestors[parent] = None
+                    queue.append(parent)
+        return list(ancestors)
+
+    def copy(self):
+        graph = HierarchyGraph()
+        graph.file_ranks = self.file_ranks
+        graph.ranks = dict(self.ranks)
+        # parents의 값은 통째로 교체되므로 공유해도 됨
+        graph.parents = dict(self.parents)
+        graph.children = {parent_name: list(children) for parent_name, children in self.children.items()}
+        graph.classes = {class_name: list(locations) for class_name, locations in self.classes.items()}
+        return graph
+
+
+def _discard_from(adjacency: dict[str, list[str]], name: str, class_name_with_path: str):
+    class_names_with_path = adjacency.get(name)
+    if class_names_with_path is not None and class_name_with_path in class_names_with_path:
+        class_names_with_path.remove(class_name_with_path)
+        if not class_names_with_path:
+            del adjacency[name]
+
+
+def build_hierarchy_graph(node_container_dict: dict[str, NodeContainer]) -> HierarchyGraph:
+    graph = HierarchyGraph()
+    ranks = {}
+    parent_names = {}
+    for file_rank, (file_path, node_container) in enumerate(node_container_dict.items()):
+        graph.file_ranks[file_path] = file_rank
+        for idx, node in enumerate(node_container.outline()):
+            if isinstance(node, ast.ClassDef):
+                class_name_with_path = f"{file_path}:{node.name}"
+                ranks.setdefault(class_name_with_path, (file_rank, float(idx)))
+                parent_names.setdefault(class_name_with_path, {}).update(
+                    dict.fromkeys(get_parent_names(node_container, node))
+                )
+
+    for class_name_with_path, rank in ranks.items():
+        graph.set_class(class_name_with_path, rank, list(parent_names[class_name_with_path]))
+    return graph
+
+
+class Library(dict):
+    """
+    {file_path: NodeContainer} of a parsed library, which also keeps the library-wide
+    indexes up to date. Classes must be inserted/removed through insert_class/remove_class.
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.class_index = build_class_index(self)
+        self.hierarchy = build_hierarchy_graph(self)
+        # {"file1:Class1": class node}, class ID로 node를 O(1)에 찾기 위한 map
+        # 아직 parsing 하지 않은 file의 class들은 처음 찾을 때 채움
+        self.class_nodes: dict[str, ast.ClassDef] = build_class_node_map(self)
+
+    def insert_class(self, file_path: str, idx: int, class_node: ast.ClassDef, journal: Journal = NULL_JOURNAL):
+        journal.insert(self[file_path].nodes, idx, class_node)
+        self.class_index.add(file_path, class_node, journal)
+        self.hierarchy.refresh(self, file_path, class_node.name, journal)
+        self._refresh_class_node(file_path, class_node.name, journal)
+
+    def remove_class(self, file_path: str, class_node: ast.ClassDef, journal: Journal = NULL_JOURNAL):
+        journal.remove(self[file_path].nodes, class_node)
+        self.class_index.remove(file_path, class_node.name, journal)
+        self.hierarchy.refresh(self, file_path, class_node.name, journal)
+        self._refresh_class_node(file_path, class_node.name, journal)
+
+    def replace_class(self, file_path: str, idx: int, class_node: ast.ClassDef, journal: Journal = NULL_JOURNAL):
+        # 같은 class를 clone으로 교체할 때 사용 (이름, base는 그대로)
+        journal.set_item(self[file_path].nodes, idx, class_node)
+        self._refresh_class_node(file_path, class_node.name, journal)
+
+    def _refresh_class_node(self, file_path: str, class_name: str, journal: Journal = NULL_JOURNAL):
+        # 같은 이름의 class가 여러 개면 file에서 먼저 나오는 class가 ID의 대상
+        class_id = f"{file_path}:{class_name}"
+        class_node = find_class_node_by_id(self, class_id)
+        if class_node is not None:
+            journal.set_item(self.class_nodes, class_id, class_node)
+        elif class_id in self.class_nodes:
+            journal.pop_item(self.class_nodes, class_id)
+
+    def get_class_node(self, class_id: str) -> ast.ClassDef | None:
+        class_node = self.class_nodes.get(class_id)
+        if class_node is None:
+            class_node = find_class_node_by_id(self, class_id)
+            if class_node is not None:
+                self.class_nodes[class_id] = class_node
+        return class_node
+
+    def update_bases(self, file_path: str, class_node: ast.ClassDef, journal: Journal = NULL_JOURNAL):
+        self.class_index.update_bases(file_path, class_node, journal)
+        self.hierarchy.refresh(self, file_path, class_node.name, journal)
+
+    def snapshot(self):
+        """
+        Copy-on-write snapshot: the containers are copied, but the class and import nodes
+        are shared with this library. A node must be cloned before it is mutated
+        (see Refactor._prepare_for_write).
+        """
+        library = Library.__new__(Library)
+        dict.update(library, (
+            (file_path, node_container.copy())
+            for file_path, node_container in self.items()
+        ))
+        library.class_index = self.class_index.copy()
+        library.hierarchy = self.hierarchy.copy()
+        library.class_nodes = dict(self.class_nodes)
+        return library
+
+
+def snapshot_library(node_container_dict: dict[str, NodeContainer]) -> Library:
+    if isinstance(node_container_dict, Library):
+        return node_container_dict.snapshot()
+    return Library(
+        (file_path, node_container.copy())
+        for file_path, node_container in node_container_dict.items()
+    )
+
+
+def get_class_index(node_container_dict: dict[str, NodeContainer]) -> ClassIndex:
+    if isinstance(node_container_dict, Library):
+        return node_container_dict.class_index
+    return build_class_index(node_container_dict)
 
+
+def get_hierarchy_graph(node_container_dict: dict[str, NodeContainer]) -> HierarchyGraph:
+    if isinstance(node_container_dict, Library):
+        return node_container_dict.hierarchy
+    return build_hierarchy_graph(node_container_dict)
+
+
+def build_class_node_map(node_container_dict: dict[str, NodeContainer]) -> dict[str, ast.ClassDef]:
+    class_nodes = {}
     for file_path, node_container in node_container_dict.items():
+        # lazy container를 여기서 parsing 하지 않음
+        if isinstance(node_container, LazyNodeContainer) and not node_container.is_loaded():
+            continue
         for node in node_container.nodes:
             if isinstance(node, ast.ClassDef):
-                if node.name in class_names:
-                    results.append(f"{file_path}:{node.name}")
+                class_nodes.setdefault(f"{file_path}:{node.name}", node)
+    return class_nodes
 
-    return results
 
+def find_class_node_by_id(node_container_dict: dict[str, NodeContainer], class_id: str) -> ast.ClassDef | None:
+    file_path, class_name = class_id.rsplit(":", 1)
+    node_container = node_container_dict.get(file_path)
+    if node_container is None:
+        return None
+    # outline이 아닌 실제 node가 필요하므로 nodes에서 찾음
+    for node in node_container.nodes:
+        if isinstance(node, ast.ClassDef) and node.name == class_name:
+            return node
+    return None
 
-def refresh_inheritance_dict(node_container_dict: dict[str, NodeContainer]):
-    from src.utils.ast_utils import get_valid_bases, get_str_bases
 
+def get_class_node(node_container_dict: dict[str, NodeContainer], class_id: str) -> ast.ClassDef | None:
+    """Class node of a class ID ("file_path:ClassName"), None if the class does not exist"""
+    if isinstance(node_container_dict, Library):
+        return node_container_dict.get_class_node(class_id)
+    return find_class_node_by_id(node_container_dict, class_id)
+
+
+def get_class_nodes(node_container_dict: dict[str, NodeContainer], class_names_with_path: list[str]) -> list[ast.ClassDef]:
+    class_nodes = []
+    for class_name_with_path in class_names_with_path:
+        file_path, class_name = class_name_with_path.rsplit(":", 1)
+        for node in node_container_dict[file_path].nodes:
+            if isinstance(node, ast.ClassDef) and node.name == class_name:
+                class_nodes.append(node)
+    return class_nodes
+
+
+def get_subclasses(node_container_dict: dict[str, NodeContainer], class_name: str) -> list[ast.ClassDef]:
+    """Direct subclasses of the classes named class_name"""
+    subclasses = []
+    for class_name_with_path in get_hierarchy_graph(node_container_dict).get_children(class_name):
+        file_path = class_name_with_path.rsplit(":", 1)[0]
+        for node in get_class_nodes(node_container_dict, [class_name_with_path]):
+            # 같은 file에 같은 이름의 class가 여럿이면 실제로 상속하는 것만
+            if class_name in get_parent_names(node_container_dict[file_path], node):
+                subclasses.append(node)
+    return subclasses
+
+
+def get_superclasses(node_container_dict: dict[str, NodeContainer], file_path: str, class_node: ast.ClassDef) -> list[ast.ClassDef]:
+    """Classes named by the bases of class_node"""
+    parent_names = get_parent_names(node_container_dict[file_path], class_node)
+    return get_class_nodes(node_container_dict, get_hierarchy_graph(node_container_dict).get_classes(parent_names))
+
+
+def get_descendants(node_container_dict: dict[str, NodeContainer], class_name: str) -> list[ast.ClassDef]:
+    return get_class_nodes(node_container_dict, get_hierarchy_graph(node_container_dict).get_descendants(class_name))
+
+
+def get_class_names_with_path(node_container_dict: dict[str, NodeContainer], class_names: list[str]):
+    return get_class_index(node_container_dict).lookup(class_names)
+
+
+def refresh_inheritance_dict(node_container_dict: dict[str, NodeContainer]):
+    class_index = get_class_index(node_container_dict)
     for file_path, node_container in node_container_dict.items():
-        for node in node_container.nodes:
+        for node in node_container.outline():
             if isinstance(node, ast.ClassDef):
                 current_class_name_with_path = f"{file_path}:{node.name}"
 
-                bases = list(get_str_bases(get_valid_bases(node)))
-                bases_with_path = get_class_names_with_path(node_container_dict, bases)
+                bases = get_base_names(node)
+                bases_with_path = class_index.lookup(bases)
                 node_container.inheritance_dict[current_class_name_with_path] = bases_with_path
 
 
+def update_inheritance_dict(
+        node_container_dict: dict[str, NodeContainer],
+        added: list[tuple[str, str]],
+        removed: list[tuple[str, str]],
+        rebased: list[tuple[str, str]],
+        journal: Journal = NULL_JOURNAL
+):
+    """
+    Incrementally update the inheritance dicts after classes, given as (file_path, class_name),
+    were added, removed or had their bases changed. Only those classes and the classes
+    which name an added/removed class as their base are recomputed.
+    """
+    if not isinstance(node_container_dict, Library):
+        refresh_inheritance_dict(node_container_dict)
+        return
+
+    class_index = node_container_dict.class_index
+
+    for file_path, class_name in rebased:
+        class_node = find_class_node(node_container_dict[file_path], class_name)
+        if class_node is not None:
+            node_container_dict.update_bases(file_path, class_node, journal)
+
+    targets = set(added) | set(rebased)
+    for file_path, class_name in added + removed:
+        for class_name_with_path in class_index.referrers.get(class_name, ()):
+            targets.add(tuple(class_name_with_path.rsplit(":", 1)))
+
+    for file_path, class_name in removed:
+        class_name_with_path = f"{file_path}:{class_name}"
+        inheritance_dict = node_container_dict[file_path].inheritance_dict
+        if class_name_with_path not in class_index.base_names and class_name_with_path in inheritance_dict:
+            journal.pop_item(inheritance_dict, class_name_with_path)
+
+    for file_path, class_name in targets:
+        class_name_with_path = f"{file_path}:{class_name}"
+        base_names = class_index.base_names.get(class_name_with_path)
+        if base_names is None:
+            continue
+        journal.set_item(node_container_dict[file_path].inheritance_dict, class_name_with_path, class_index.lookup(base_names))
+
+
 def get_full_inheritance_dict(node_container_dict: dict[str, NodeContainer]):
     result_dict = {}
     for node_container in node_container_dict.values():
@@ -61,48 +631,305 @@ def get_full_inheritance_dict(node_container_dict: dict[str, NodeContainer]):
     return result_dict
 
 
-def parse_library(library_path):
-    container_dict = {}
+def _is_target_python_file(file_path):
+    file = os.path.basename(file_path)
+    return file.endswith('.py') and file not in IGNORE_PYTHON_FILE
+
+
+def _is_archive(library_path):
+    return os.path.isfile(library_path) and (zipfile.is_zipfile(library_path) or tarfile.is_tarfile(library_path))
+
+
+def _is_archive_junk(member_name):
+    # macOS에서 만든 zip에 포함되는 __MACOSX/._*.py 같은 metadata 파일
+    return member_name.startswith("__MACOSX/") or os.path.basename(member_name).startswith("._")
+
+
+def _collect_python_files(library_path):
+    file_paths = []
 
     for root, dirs, files in os.walk(library_path):
         for file in files:
-            if file.endswith('.py') and file not in IGNORE_PYTHON_FILE:
-                file_path = f"{root}/{file}"
+            if _is_target_python_file(file):
+                file_paths.append(f"{root}/{file}")
+
+    return file_paths
+
+
+def _read_archive(library_path):
+    # 압축을 풀지 않고 archive를 한 번 훑으면서 python file들의 source를 읽음
+    sources = []
+
+    if zipfile.is_zipfile(library_path):
+        with zipfile.ZipFile(library_path) as archive:
+            for member_name in archive.namelist():
+                if _is_target_python_file(member_name) and not _is_archive_junk(member_name):
+                    sources.append((member_name, archive.read(member_name).decode(ENCODING)))
+    else:
+        with tarfile.open(library_path) as archive:
+            for member in archive:
+                if member.isfile() and _is_target_python_file(member.name) and not _is_archive_junk(member.name):
+                    sources.append((member.name, archive.extractfile(member).read().decode(ENCODING)))
+
+    return sources
+
+
+def _read_source(source):
+    if isinstance(source, tuple):
+        archive_path, member_name = source
+        if zipfile.is_zipfile(archive_path):
+            with zipfile.ZipFile(archive_path) as archive:
+                return archive.read(member_name).decode(ENCODING)
+        with tarfile.open(archive_path) as archive:
+            return archive.extractfile(member_name).read().decode(ENCODING)
+
+    with open(source, "r", encoding=ENCODING) as f:
+        return f.read()
+
+
+def _parse_nodes(code):
+    tree = ast.parse(code)
+    return [
+        node
+        for node in tree.body
+        if isinstance(node, ast.ClassDef | ast.Import | ast.ImportFrom)
+    ]
+
+
+# module 최상위(0번째 column)에서 시작하는 class/import 문, 그 사이의 string과 comment는 건너뜀
+_OUTLINE_PATTERN = re.compile(
+    r'"""(?:\\[\s\S]|[^\\])*?"""'
+    r"|'''(?:\\[\s\S]|[^\\])*?'''"
+    r'|"(?:\\[\s\S]|[^"\\\n])*"'
+    r"|'(?:\\[\s\S]|[^'\\\n])*'"
+    r"|#[^\n]*"
+    r"|^(?:class|import|from)\b",
+    re.MULTILINE
+)
+# 여러 줄에 걸친 class/import 문의 최대 줄 수, 넘으면 전체 parsing으로 처리
+_MAX_OUTLINE_STATEMENT_LINES = 100
+
+
+def _parse_outline(code):
+    """
+    Class and import statements at the top level of code, found by a regex scan instead of
+    a full parse. Only the statements themselves are parsed (a class header with its body
+    replaced by pass), so the class bodies are never parsed. Returns None if a statement
+    cannot be parsed this way, in which case the caller falls back to a full parse.
+    """
+    lines = code.splitlines(keepends=True)
+    line_starts = [0]
+    for line in lines:
+        line_starts.append(line_starts[-1] + len(line))
+
+    nodes = []
+    statement_end = 0
+    for match in _OUTLINE_PATTERN.finditer(code):
+        if match.group().startswith(("'", '"', "#")) or match.start() < statement_end:
+            continue
+
+        line_idx = bisect_right(line_starts, match.start()) - 1
+        statement_nodes = None
+        for end_idx in range(line_idx + 1, min(line_idx + _MAX_OUTLINE_STATEMENT_LINES, len(lines)) + 1):
+            statement = "".join(lines[line_idx:end_idx])
+            statement_nodes = _parse_statement(statement)
+            if statement_nodes is not None:
+                statement_end = line_starts[end_idx]
+                break
+        if statement_nodes is None:
+            return None
+
+        for node in statement_nodes:
+            ast.increment_lineno(node, line_idx)
+        nodes.extend(statement_nodes)
+
+    return nodes
+
+
+def _parse_statement(statement):
+    # class header는 body 없이는 parsing 되지 않으므로 pass를 붙여서 한 번 더 시도
+    for code in (statement, f"{statement.rstrip()}\n    pass\n"):
+        try:
+            tree = ast.parse(code)
+        except SyntaxError:
+            continue
+        return [node for node in tree.body if isinstance(node, ast.ClassDef | ast.Import | ast.ImportFrom)]
+    return None
+
+
+def _get_cache_path(cache_dir, code):
+    # ast 구조는 python 버전마다 다를 수 있으므로 버전도 key에 포함
+    hasher = hashlib.sha256()
+    hasher.update(f"{PARSE_CACHE_VERSION}:{sys.version_info[:3]}:".encode(ENCODING))
+    hasher.update(code.encode(ENCODING))
+    return os.path.join(cache_dir, f"{hasher.hexdigest()}.pickle")
+
+
+def _load_cached_nodes(cache_path):
+    # 없거나 깨졌거나 다른 환경에서 만든 cache는 모두 cache miss로 처리
+    try:
+        with open(cache_path, "rb") as f:
+            return pickle.load(f)
+    except Exception:
+        return None
+
+
+def _save_cached_nodes(cache_path, nodes):
+    # 여러 process가 동시에 쓰더라도 깨진 파일이 보이지 않도록 임시 파일에 쓴 뒤 교체
+    temp_path = f"{cache_path}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        with open(temp_path, "wb") as f:
+            pickle.dump(nodes, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_path, cache_path)
+    except OSError:
+        # 쓸 수 없는 위치(read-only, disk full 등)면 cache 없이 계속 진행
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+
+
+def _load_nodes(source, cache_dir=None, code=None):
+    if code is None:
+        code = _read_source(source)
+
+    if cache_dir is None:
+        return _parse_nodes(code)
+
+    cache_path = _get_cache_path(cache_dir, code)
+    nodes = _load_cached_nodes(cache_path)
+    if nodes is None:
+        nodes = _parse_nodes(code)
+        _save_cached_nodes(cache_path, nodes)
+    return nodes
+
+
+def _create_class_summary_node(class_node: ast.ClassDef) -> ast.ClassDef:
+    from eval.class_parser import summarize_class
+
+    summary_node = create_class_outline(class_node)
+    summary_node.summary = summarize_class(class_node)
+    return summary_node
+
+
+def _parse_file(source, code=None, cache_dir=None, lazy=False, summary=False):
+    # 하나의 파일을 parsing 하여 NodeContainer 생성, class가 없는 파일은 None
+    nodes = None
+    if lazy:
+        if code is None:
+            code = _read_source(source)
+        # class body는 parsing 하지 않고 outline만 읽음
+        nodes = _parse_outline(code)
+    if nodes is None:
+        nodes = _load_nodes(source, cache_dir, code)
+
+    has_class_node = False
+    if lazy:
+        node_container = LazyNodeContainer(source, cache_dir)
+        container_nodes = node_container.outline_nodes
+    else:
+        node_container = NodeContainer()
+        container_nodes = node_container.nodes
+
+    for node in nodes:
+        if isinstance(node, ast.ClassDef):
+            has_class_node = True
+            if summary:
+                container_nodes.append(_create_class_summary_node(node))
+            elif lazy:
+                container_nodes.append(create_class_outline(node))
+            else:
+                container_nodes.append(node)
+        elif isinstance(node, ast.Import | ast.ImportFrom):
+            container_nodes.append(node)
+            for alias in node.names:
+                node_container.add_alias(alias)
+
+    if not has_class_node:
+        return None
+
+    return node_container
+
+
+def parse_library(
+        library_path,
+        workers: int | None = None,
+        cache_dir: str | None = None,
+        lazy: bool = False,
+        summary: bool = False
+):
+    """
+    Parse every python file of the library into {file_path: NodeContainer}.
+
+    library_path may also be a zip or tar archive, in which case the members are read
+    directly from the archive and the keys are the archive-relative member paths.
+
+    If workers > 1, files are read and parsed in a process pool. Results are merged
+    in the os.walk order either way, so (file_path, idx) locations are identical
+    between serial and parallel runs.
+
+    If cache_dir is given, the parsed top-level nodes of each file are pickled there,
+    keyed by the file content hash and the python version, and unchanged files are
+    loaded from the cache instead of being parsed again.
+
+    If lazy is True, only the outline of each file (class names, bases and imports) is read,
+    with a regex scan that parses the class headers and imports but not the class bodies.
+    This is enough for the inheritance dicts and class locations. A file is fully parsed
+    when the nodes of its container (or of any copy of it) are accessed for the first time.
+
+    If summary is True, each class node is replaced by a body-less outline carrying a compact
+    ClassSummary (see eval.class_parser), which is all Evaluation needs. The result can be
+    evaluated but not refactored.
+    """
+    if lazy and summary:
+        raise ValueError("lazy and summary parsing modes cannot be used together")
 
-                with open(file_path, "r", encoding=ENCODING) as f:
-                    code = f.read()
+    if _is_archive(library_path):
+        archive_sources = _read_archive(library_path)
+        file_paths = [member_name for member_name, _ in archive_sources]
+        sources = [(library_path, member_name) for member_name in file_paths]
+        codes = [code for _, code in archive_sources]
+    else:
+        file_paths = _collect_python_files(library_path)
+        sources = file_paths
+        codes = [None] * len(file_paths)
 
-                tree = ast.parse(code)
+    parse_file = partial(_parse_file, cache_dir=cache_dir, lazy=lazy, summary=summary)
 
-                has_class_node = False
-                node_container = NodeContainer()
-                for node in tree.body:
-                    if isinstance(node, ast.ClassDef):
-                        has_class_node = True
-                        node_container.nodes.append(node)
-                    elif isinstance(node, ast.Import | ast.ImportFrom):
-                        node_container.nodes.append(node)
-                        node_container.aliases.extend(node.names)
+    if workers is not None and workers > 1 and len(file_paths) > 1:
+        chunksize = max(1, len(file_paths) // (workers * 4))
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            node_containers = list(executor.map(parse_file, sources, codes, chunksize=chunksize))
+    else:
+        node_containers = [parse_file(source, code) for source, code in zip(sources, codes)]
 
-                if has_class_node:
-                    container_dict[file_path] = node_container
+    container_dict = Library(
+        (file_path, node_container)
+        for file_path, node_container in zip(file_paths, node_containers)
+        if node_container is not None
+    )
 
     refresh_inheritance_dict(container_dict)
 
     return container_dict
 
 
-def get_class_locations(node_container_dict: dict[str, NodeContainer]):
+def get_class_locations(node_container_dict: dict[str, NodeContainer], as_ids: bool = False):
+    """
+    (file_path, idx) of every class, or with as_ids the class IDs ("file_path:ClassName") which
+    keep pointing to the same class when other classes or imports are inserted/removed.
+    """
     result = []
     for file_path, node_container in node_container_dict.items():
-        for idx, node in enumerate(node_container.nodes):
+        for idx, node in enumerate(node_container.outline()):
             if isinstance(node, ast.ClassDef):
-                result.append((file_path, idx))
-    return result
+                result.append(f"{file_path}:{node.name}" if as_ids else (file_path, idx))
+    # 같은 file에 같은 이름의 class가 여러 개면 ID는 하나
+    return list(dict.fromkeys(result)) if as_ids else result
 
 
 if __name__ == '__main__':
-    # src/target_library_zips 폴더에 있는 pyflakes.zip 파일을 src/target_libraries 경로에 압축 풀기
-    # -> src/target_libraries/pyflakes 경로가 생기도록
-    result = parse_library("../target_libraries/pyflakes")
+    # src/target_library_zips 폴더에 있는 pyflakes.zip 파일을 압축 풀지 않고 바로 parsing
+    result = parse_library("../target_library_zips/pyflakes.zip")
     pprint(result)
@@ -5,174 +5,313 @@ from abc import ABC, abstractmethod
 from itertools import combinations
 from random import choice
 
-from src.core.parsing import NodeContainer, refresh_inheritance_dict
+from src.core.journal import Journal, NULL_JOURNAL
+from src.core.parsing import NodeContainer, Library, update_inheritance_dict, snapshot_library, \
+    get_subclasses, get_superclasses, get_descendants, get_hierarchy_graph, get_parent_names, get_class_nodes, get_class_node
 from src.utils.ast_utils import find_normal_methods, find_instance_fields, MethodRenamer, \
     create_super_init_call, find_self_dependencies, \
     update_field_references, update_descendant_chain, find_method_in_class, method_exists_in_class, \
     get_container_for_node, \
-    MethodOccurrenceChecker, InstanceFieldOccurrenceChecker, InitMethodInjector, is_direct_self_attr, \
+    get_class_usage, invalidate_class_usage, InitMethodInjector, is_direct_self_attr, \
     SelfAttributeOccurrenceReplacer, check_inherit_abc, AbstractMethodDecoratorChecker, \
     get_str_bases, is_property_decorated_method, check_functions_equal, add_method_to_class, \
-    delete_method_from_class, SelfOccurrenceReplacer, get_valid_bases
+    delete_method_from_class, SelfOccurrenceReplacer, get_valid_bases, get_fingerprint, invalidate_fingerprints, \
+    fix_missing_locations
 
 
 class InvalidLocationException(Exception):
     ...
 
 
+def remap_nodes(value, memo: dict):
+    """Replace the ast nodes in value (possibly nested in list/tuple/set/dict) by their clones in memo"""
+    if isinstance(value, ast.AST):
+        return memo.get(id(value), value)
+    if type(value) is list:
+        return [remap_nodes(item, memo) for item in value]
+    if type(value) is tuple:
+        return tuple(remap_nodes(item, memo) for item in value)
+    if type(value) is set:
+        return {remap_nodes(item, memo) for item in value}
+    if type(value) is dict:
+        return {remap_nodes(k, memo): remap_nodes(v, memo) for k, v in value.items()}
+    return value
+
+
+class ChangeSet:
+    """What a refactoring changed. Classes are (file_path, class_name), files are file_path"""
+    def __init__(self):
+        self.created: list[tuple[str, str]] = []
+        self.deleted: list[tuple[str, str]] = []
+        # 실제로 내용(body, bases 등)이 바뀐 기존 class들
+        self.modified: list[tuple[str, str]] = []
+        # bases가 바뀐 class들 (modified에도 포함)
+        self.rebased: list[tuple[str, str]] = []
+        # import가 추가된 file들
+        self.imported: list[str] = []
+        # 수정될 수 있었던 class들 (write set), cache 무효화 등 보수적으로 다시 계산할 때 사용
+        self.writable: list[tuple[str, str]] = []
+
+    def __bool__(self):
+        return bool(self.created or self.deleted or self.modified or self.rebased or self.imported)
+
+    def __str__(self):
+        def format_classes(classes):
+            return ", ".join(f"{file_path}:{class_name}" for file_path, class_name in classes) or "-"
+
+        return (
+            f"created: {format_classes(self.created)}\n"
+            f"deleted: {format_classes(self.deleted)}\n"
+            f"modified: {format_classes(self.modified)}\n"
+            f"rebased: {format_classes(self.rebased)}\n"
+            f"imported: {', '.join(self.imported) or '-'}"
+        )
+
+
 class Refactor(ABC):
     def __construct_subclasses(self):
-        self.class_names = []
-        self.subclasses = []
-        for node_container in self.result.values():
-            for node in node_container.nodes:
-                if isinstance(node, ast.ClassDef):
-                    self.class_names.append(node.name)
-                    if any(
-                            node_container.lookup_alias(base) == self.target_class_node.name
-                            for base in get_str_bases(get_valid_bases(node))
-                    ):
-                        self.subclasses.append(node)
+        # hierarchy graph로 찾고, 실제 node가 필요한 file만 parsing
+        self.subclasses = get_subclasses(self.result, self.target_class_node.name)
 
     def __construct_superclasses(self):
-        self.superclasses = []
-        superclass_names = [
-            self.target_node_container.lookup_alias(base)
-            for base in get_str_bases(get_valid_bases(self.target_class_node))
-        ]
-        for node_container in self.result.values():
-            for node in node_container.nodes:
-                if isinstance(node, ast.ClassDef) and node.name in superclass_names:
-                    self.superclasses.append(node)
+        self.superclasses = get_superclasses(self.result, self.file_path, self.target_class_node)
 
     def _get_all_descendants(self, current_node: ast.ClassDef):
-        current_subclasses = []
-
-        for node_container in self.result.values():
-            for node in node_container.nodes:
-                if isinstance(node, ast.ClassDef):
-                    if any(
-                            node_container.lookup_alias(base) == current_node.name
-                            for base in get_str_bases(get_valid_bases(node))
-                    ):
-                        current_subclasses.append(node)
-
-        more_subclasses = []
-        for subclass in current_subclasses:
-            more_subclasses.extend(self._get_all_descendants(subclass))
-
-        return current_subclasses + more_subclasses
+        return get_descendants(self.result, current_node.name)
+
+    def _get_direct_subclasses(self, class_node: ast.ClassDef):
+        return get_subclasses(self.result, class_node.name)
+
+    def _get_writable_class_names_with_path(self) -> list[str]:
+        # _do에서 수정될 수 있는 class들: target, superclass와 그 subclass들(sibling), target의 모든 descendant
+        graph = get_hierarchy_graph(self.result)
+        writable = {f"{self.file_path}:{self.target_class_node.name}": None}
+        for superclass in graph.get_classes(get_parent_names(self.target_node_container, self.target_class_node)):
+            writable[superclass] = None
+            writable.update(dict.fromkeys(graph.get_children(superclass.rsplit(":", 1)[1])))
+        writable.update(dict.fromkeys(graph.get_descendants(self.target_class_node.name)))
+
+        return list(writable)
+
+    def _prepare_for_write(self, writable_class_names_with_path: list[str]):
+        # copy-on-write: 수정될 class들만 clone 해서 result에 넣고, 이 객체가 가진 node 참조를 clone으로 교체
+        memo = {}
+        for class_name_with_path in writable_class_names_with_path:
+            file_path, class_name = class_name_with_path.rsplit(":", 1)
+            node_container = self.result[file_path]
+            for idx, node in enumerate(node_container.nodes):
+                if isinstance(node, ast.ClassDef) and node.name == class_name:
+                    self.result.replace_class(file_path, idx, copy.deepcopy(node, memo))
+
+        for name, value in list(vars(self).items()):
+            if name not in ("base", "result", "target_node_container", "journal"):
+                setattr(self, name, remap_nodes(value, memo))
 
     def __execute_post_processes(self):
         # refactoring 수행 이후 후처리 작업들
 
         if len(self.target_class_node.body) == 0:
-            self.target_class_node.body.append(ast.Pass())
+            self.journal.append(self.target_class_node.body, ast.Pass())
 
-        # DIT 계산을 위해 inheritance dict refresh
-        refresh_inheritance_dict(self.result)
+        self._invalidate_caches()
 
-    def __init__(self, base: dict[str, NodeContainer], location):
+        # DIT 계산을 위해 바뀐 class들의 inheritance dict만 갱신
+        update_inheritance_dict(
+            self.result,
+            self.change_set.created,
+            self.change_set.deleted,
+            self.change_set.rebased,
+            self.journal
+        )
+
+    def __init__(self, base: dict[str, NodeContainer], location, in_place: bool = False):
         self.base = base
-        self.result = copy.deepcopy(base)
-        self.file_path = location[0]
-        self.node_idx = location[1]
+        self.in_place = in_place
+        if in_place:
+            # base를 직접 수정하고, 수정 내역을 journal에 기록해서 undo 때 되돌림
+            if not isinstance(base, Library):
+                raise TypeError("In-place refactoring requires a Library returned by parse_library")
+            self.result = base
+            self.journal = Journal()
+        else:
+            # node들은 base와 공유하고, _do 직전에 수정될 class들만 clone
+            self.result = snapshot_library(base)
+            self.journal = NULL_JOURNAL
+        self.file_path, self.node_idx, self.target_class_node = self._find_target(self.result, location)
+        self.change_set = ChangeSet()
 
         self.target_node_container = self.result[self.file_path]
 
+        self.__construct_subclasses()
+        self.__construct_superclasses()
+
+    @abstractmethod
+    def is_possible(self):
+        ...
+
+    @classmethod
+    def can_apply(cls, base: dict[str, NodeContainer], location) -> bool:
+        """
+        Read-only version of is_possible() which runs on the shared library, so that the refactoring
+        only has to be constructed for the candidates which pass.
+        """
+        try:
+            file_path, _, class_node = cls._find_target(base, location)
+        except InvalidLocationException:
+            return False
+
+        return cls._can_apply(base, file_path, class_node)
+
+    @staticmethod
+    def _find_target(base: dict[str, NodeContainer], location) -> tuple[str, int, ast.ClassDef]:
+        """
+        location is either (file_path, idx) or a class ID ("file_path:ClassName").
+        Returns (file_path, idx, class node), raises InvalidLocationException if there is no such class.
+        """
+        if isinstance(location, str):
+            class_node = get_class_node(base, location)
+            if class_node is None:
+                raise InvalidLocationException(f"Cannot construct Refactor for {location}, the class does not exist")
+            file_path = location.rsplit(":", 1)[0]
+            return file_path, base[file_path].nodes.index(class_node), class_node
+
+        file_path, node_idx = location
         try:
-            target_class_node = self.target_node_container.nodes[self.node_idx]
+            class_node = base[file_path].nodes[node_idx]
         except Exception as e:
             raise InvalidLocationException(f"Cannot construct Refactor for {location}, with error: {e}")
 
-        if not isinstance(target_class_node, ast.ClassDef):
-            raise InvalidLocationException(f"{target_class_node} is not an instance of ast.ClassDef, location: {location}")
-
-        self.target_class_node = target_class_node
+        if not isinstance(class_node, ast.ClassDef):
+            raise InvalidLocationException(f"{class_node} is not an instance of ast.ClassDef, location: {location}")
 
-        self.__construct_subclasses()
-        self.__construct_superclasses()
+        return file_path, node_idx, class_node
 
+    @classmethod
     @abstractmethod
-    def is_possible(self):
+    def _can_apply(cls, base: dict[str, NodeContainer], file_path: str, class_node: ast.ClassDef) -> bool:
         ...
 
     @abstractmethod
-    def _do(self):
+    def _do(self) -> bool | None:
+        """Perform the refactoring, returns False if it stopped before changing anything"""
         ...
 
-    def do(self):
+    def do(self) -> bool:
+        """Apply the refactoring, returns False if it was not possible"""
         if not self.is_possible():
-            return
+            return False
 
-        self._do()
+        writable_class_names_with_path = self._get_writable_class_names_with_path()
+        self.change_set.writable.extend(
+            tuple(class_name_with_path.rsplit(":", 1))
+            for class_name_with_path in writable_class_names_with_path
+        )
+        fingerprints_before = self._get_class_fingerprints(writable_class_names_with_path)
+        if not self.in_place:
+            self._prepare_for_write(writable_class_names_with_path)
+        if self._do() is False:
+            self.undo()
+            return False
         self.__execute_post_processes()
+        self._report_modified(fingerprints_before)
+        return True
+
+    def _get_class_fingerprints(self, class_names_with_path: list[str]) -> dict[str, list[bytes]]:
+        return {
+            class_name_with_path: [get_fingerprint(node) for node in get_class_nodes(self.result, [class_name_with_path])]
+            for class_name_with_path in class_names_with_path
+        }
+
+    def _report_modified(self, fingerprints_before: dict[str, list[bytes]]):
+        # write set 중에서 fingerprint가 달라진 class만 modified로 기록
+        deleted = {f"{file_path}:{class_name}" for file_path, class_name in self.change_set.deleted}
+        fingerprints_after = self._get_class_fingerprints(list(fingerprints_before))
+        for class_name_with_path, fingerprints in fingerprints_before.items():
+            if class_name_with_path not in deleted and fingerprints_after[class_name_with_path] != fingerprints:
+                self.change_set.modified.append(tuple(class_name_with_path.rsplit(":", 1)))
+
+    def _invalidate_caches(self):
+        # 수정되었을 수 있는 class들에 cache된 fingerprint, usage를 버림
+        class_names_with_path = [
+            f"{file_path}:{class_name}"
+            for file_path, class_name in self.change_set.writable + self.change_set.created
+        ]
+        for class_node in get_class_nodes(self.result, class_names_with_path):
+            invalidate_fingerprints(class_node)
+            invalidate_class_usage(class_node)
 
     def undo(self):
-        self.result = self.base
+        if self.in_place:
+            self.journal.rollback()
+            self._invalidate_caches()
+        else:
+            self.result = self.base
+        self.change_set = ChangeSet()
+
+    def _report_rebased(self, class_node: ast.ClassDef, file_path: str | None = None):
+        if file_path is None:
+            file_path, _ = get_container_for_node(class_node, self.result)
+        self.change_set.rebased.append((file_path, class_node.name))
 
 
 # Method Level Refactorings
 class PushDownMethod(Refactor):
-    def __init__(self, base: dict[str, NodeContainer], location):
-        super().__init__(base, location)
+    def __init__(self, base: dict[str, NodeContainer], location, in_place: bool = False):
+        super().__init__(base, location, in_place)
         self.methods = find_normal_methods(self.target_class_node.body)
 
     def is_possible(self):
         return len(self.methods) >= 1 and len(self.subclasses) >= 1
 
+    @classmethod
+    def _can_apply(cls, base, file_path, class_node):
+        return len(find_normal_methods(class_node.body)) >= 1 and len(get_subclasses(base, class_node.name)) >= 1
+
     def _do(self):
         method_node = choice(self.methods)
         is_property_method = is_property_decorated_method(method_node)
 
         method_idx = self.target_class_node.body.index(method_node)
-        self.target_class_node.body.pop(method_idx)
+        self.journal.pop(self.target_class_node.body, method_idx)
 
         # 다른 method에서 쓰이고 있으면 중단
-        self_occurrence_checker = MethodOccurrenceChecker(method_node.name, is_property_method)
-        self_occurrence_checker.visit(self.target_class_node)
-        if self_occurrence_checker.occurred:
-            self.target_class_node.body.insert(method_idx, method_node)
+        if get_class_usage(self.target_class_node).uses_method(method_node.name, is_property_method):
+            self.journal.insert(self.target_class_node.body, method_idx, method_node)
             return
 
         moved = False
         # add method to subclasses of target class
         for node in self.subclasses:
             # find the occurrence of method
-            checker = MethodOccurrenceChecker(method_node.name, is_property_method)
-            checker.visit(node)
+            usage = get_class_usage(node)
 
-            if checker.occurred and not checker.defined:
+            if usage.uses_method(method_node.name, is_property_method) and not usage.defines_method(method_node.name):
                 new_method = copy.deepcopy(method_node)
-                add_method_to_class(node, new_method)
+                add_method_to_class(node, new_method, self.journal)
                 moved = True
 
         if moved:
             # remove method from target class only when a move occurs
-            self.result[self.file_path].nodes[self.node_idx] = self.target_class_node
+            self.journal.set_item(self.result[self.file_path].nodes, self.node_idx, self.target_class_node)
         else:
             # otherwise, revert.
-            self.target_class_node.body.insert(method_idx, method_node)
+            self.journal.insert(self.target_class_node.body, method_idx, method_node)
 
 
 class PullUpMethod(Refactor):
-    def __init__(self, base: dict[str, NodeContainer], location):
-        super().__init__(base, location)
+    def __init__(self, base: dict[str, NodeContainer], location, in_place: bool = False):
+        super().__init__(base, location, in_place)
         self.methods = find_normal_methods(self.target_class_node.body)
 
     def is_possible(self):
         return len(self.methods) >= 1 and len(self.superclasses) >= 1
 
+    @classmethod
+    def _can_apply(cls, base, file_path, class_node):
+        return len(find_normal_methods(class_node.body)) >= 1 and len(get_superclasses(base, file_path, class_node)) >= 1
+
     def _get_siblings(self, immediate_superclass: ast.ClassDef, method: ast.FunctionDef):
-        siblings = []
-        for node_container in self.result.values():
-            for node in node_container.nodes:
-                if isinstance(node, ast.ClassDef):
-                    if any(
-                            node_container.lookup_alias(base) == immediate_superclass.name
-                            for base in get_str_bases(get_valid_bases(node))
-                    ):
-                        siblings.append(node)
+        siblings = self._get_direct_subclasses(immediate_superclass)
 
         siblings_with_same_method_defs = []
         for sibling in siblings:
@@ -187,29 +326,27 @@ class PullUpMethod(Refactor):
     def _do(self):
         method_node = choice(self.methods)
         immediate_superclass = choice(self.superclasses)
-        is_property_method = is_property_decorated_method(method_node)
 
         # superclass에 이미 method가 있으면 pull up 안함
-        checker = MethodOccurrenceChecker(method_node.name, is_property_method)
-        checker.visit(immediate_superclass)
-        if checker.defined:
+        if get_class_usage(immediate_superclass).defines_method(method_node.name):
             return
 
         siblings = [self.target_class_node] + self._get_siblings(immediate_superclass, method_node)
         for sibling in siblings:
-            delete_method_from_class(sibling, method_node)
+            delete_method_from_class(sibling, method_node, self.journal)
 
         add_method_to_class(
             class_node=immediate_superclass,
-            method_node=copy.deepcopy(method_node)
+            method_node=copy.deepcopy(method_node),
+            journal=self.journal
         )
 
 
 # foo() -> public, _foo() -> protected, __foo() -> private
 # Decrease Accessibility: foo() -> _foo() or _foo() -> __foo()
 class DecreaseMethodAccess(Refactor):
-    def __init__(self, base: dict[str, NodeContainer], location):
-        super().__init__(base, location)
+    def __init__(self, base: dict[str, NodeContainer], location, in_place: bool = False):
+        super().__init__(base, location, in_place)
         self.public_or_protected_methods = [
             method for method in find_normal_methods(self.target_class_node.body)
             if not method.name.startswith("__")
@@ -218,6 +355,10 @@ class DecreaseMethodAccess(Refactor):
     def is_possible(self):
         return len(self.public_or_protected_methods) >= 1
 
+    @classmethod
+    def _can_apply(cls, base, file_path, class_node):
+        return any(not method.name.startswith("__") for method in find_normal_methods(class_node.body))
+
     def _do(self):
         method_node = choice(self.public_or_protected_methods)
         is_property_method = is_property_decorated_method(method_node)
@@ -230,24 +371,21 @@ class DecreaseMethodAccess(Refactor):
                 if method_node.name == new_name:
                     return
 
-        renamer = MethodRenamer(old_name, new_name, is_property_method)
+        renamer = MethodRenamer(old_name, new_name, is_property_method, self.journal)
         renamer.visit(self.target_class_node)
 
         # Change the all occurrence of method in descendants
         descendants = self._get_all_descendants(self.target_class_node)
 
         for descendant in descendants:
-            occurrence_checker = MethodOccurrenceChecker(old_name, is_property_method)
-            occurrence_checker.visit(descendant)
-
-            if not occurrence_checker.defined:
+            if not get_class_usage(descendant).defines_method(old_name):
                 renamer.visit(descendant)
 
 
 # Increase Accessibility: _foo() -> foo() or __foo() -> _foo()
 class IncreaseMethodAccess(Refactor):
-    def __init__(self, base: dict[str, NodeContainer], location):
-        super().__init__(base, location)
+    def __init__(self, base: dict[str, NodeContainer], location, in_place: bool = False):
+        super().__init__(base, location, in_place)
         self.protected_or_private_methods = [
             method for method in find_normal_methods(self.target_class_node.body)
             if method.name.startswith("_")
@@ -256,6 +394,10 @@ class IncreaseMethodAccess(Refactor):
     def is_possible(self):
         return len(self.protected_or_private_methods) >= 1
 
+    @classmethod
+    def _can_apply(cls, base, file_path, class_node):
+        return any(method.name.startswith("_") for method in find_normal_methods(class_node.body))
+
     def _do(self):
         method_node = choice(self.protected_or_private_methods)
         is_property_method = is_property_decorated_method(method_node)
@@ -268,46 +410,55 @@ class IncreaseMethodAccess(Refactor):
                 if method_node.name == new_name:
                     return
 
-        renamer = MethodRenamer(old_name, new_name, is_property_method)
+        renamer = MethodRenamer(old_name, new_name, is_property_method, self.journal)
         renamer.visit(self.target_class_node)
 
         # Change the all occurrence of method in descendants
         descendants = self._get_all_descendants(self.target_class_node)
 
         for descendant in descendants:
-            occurrence_checker = MethodOccurrenceChecker(old_name, is_property_method)
-            occurrence_checker.visit(descendant)
-
-            if not occurrence_checker.defined:
+            if not get_class_usage(descendant).defines_method(old_name):
                 renamer.visit(descendant)
 
 
 # Field Level Refactorings
 class PushDownField(Refactor):
-    def __init__(self, base: dict[str, NodeContainer], location):
-        super().__init__(base, location)
+    def __init__(self, base: dict[str, NodeContainer], location, in_place: bool = False):
+        super().__init__(base, location, in_place)
         self.fields = find_instance_fields(self.target_class_node.body)
 
+    @staticmethod
+    def _is_field_used_by(class_node: ast.ClassDef, field_name: str) -> bool:
+        return get_class_usage(class_node).uses_field_outside_init(field_name)
+
     def is_field_used_by_parent(self, field_name: str) -> bool:
         """Check if any non-init method in parent class uses this field"""
-        checker = InstanceFieldOccurrenceChecker(field_name)
-        for node in self.target_class_node.body:
-            if isinstance(node, ast.FunctionDef) and node.name != "__init__":
-                checker.visit(node)
-        return checker.occurred
-
-    def is_possible(self):
-        if not (len(self.fields) >= 1 and len(self.subclasses) >= 1):
-            return False
+        return self._is_field_used_by(self.target_class_node, field_name)
 
+    @classmethod
+    def _has_pushable_field(cls, class_node: ast.ClassDef, fields: list[ast.Assign]) -> bool:
         # Check each field
-        for field in self.fields:
+        for field in fields:
             field_name = field.targets[0].attr
-            if not self.is_field_used_by_parent(field_name):
+            if not cls._is_field_used_by(class_node, field_name):
                 return True
         # print(f"All fields used by parent method")
         return False
 
+    def is_possible(self):
+        if not (len(self.fields) >= 1 and len(self.subclasses) >= 1):
+            return False
+
+        return self._has_pushable_field(self.target_class_node, self.fields)
+
+    @classmethod
+    def _can_apply(cls, base, file_path, class_node):
+        fields = find_instance_fields(class_node.body)
+        if not (len(fields) >= 1 and len(get_subclasses(base, class_node.name)) >= 1):
+            return False
+
+        return cls._has_pushable_field(class_node, fields)
+
     def _do(self):
         if not self.is_possible():
             return
@@ -322,11 +473,10 @@ class PushDownField(Refactor):
         # find candidate field for pushdown
         pushdown_candidates = []
         for candidate_field_name in pushable_fields:
-            checker = InstanceFieldOccurrenceChecker(field_name=candidate_field_name)
             pushable_subclasses = []
             for subclass in self.subclasses:
-                checker.visit(subclass)
-                if checker.occurred and not checker.defined:
+                usage = get_class_usage(subclass)
+                if usage.uses_field(candidate_field_name) and not usage.defines_field(candidate_field_name):
                     pushable_subclasses.append(subclass)
             pushdown_candidates.append((candidate_field_name, pushable_subclasses))
         
@@ -384,41 +534,28 @@ class PushDownField(Refactor):
                     end_lineno=1,
                     end_col_offset=0
                 )
-                pushdown_subclass.body.insert(0, init_method)
+                self.journal.insert(pushdown_subclass.body, 0, init_method)
 
             # Add field assignment after super().__init__()
             new_field = copy.deepcopy(field_node)
-            init_method.body.insert(1, new_field)
+            self.journal.insert(init_method.body, 1, new_field)
             
             if init_idx is not None:
                 # Remove field from parent's __init__
                 # Shouldn't always remove it: only when we actually push down?
                 init_body = self.target_class_node.body[init_idx].body
-                init_body.remove(field_node)
+                self.journal.remove(init_body, field_node)
             # self.result[self.file_path].refactored = refactor_occurred
 
 
 class PullUpField(Refactor):
-    def __init__(self, base: dict[str, NodeContainer], location):
-        super().__init__(base, location)
+    def __init__(self, base: dict[str, NodeContainer], location, in_place: bool = False):
+        super().__init__(base, location, in_place)
         # Find fields in target class
         self.fields = find_instance_fields(self.target_class_node.body)
         
         # Find immediate superclass 
-        superclass_names = [
-            self.target_node_container.lookup_alias(base)
-            for base in get_str_bases(get_valid_bases(self.target_class_node))
-        ]
-        
-        # Look for superclass definition
-        self.superclass = None
-        for node_container in self.result.values():
-            for node in node_container.nodes:
-                if isinstance(node, ast.ClassDef) and node.name in superclass_names:
-                    self.superclass = node
-                    break
-            if self.superclass:
-                break
+        self.superclass = self.superclasses[0] if self.superclasses else None
 
     def get_field_info(self, field_node: ast.Assign):
         """Get field name and value"""
@@ -428,9 +565,13 @@ class PullUpField(Refactor):
 
     def get_independent_fields(self):
         """Return fields that don't depend on other fields or methods in the class"""
+        return self._get_independent_fields(self.fields)
+
+    @staticmethod
+    def _get_independent_fields(fields: list[ast.Assign]):
         independent_fields = []
         
-        for field in self.fields:
+        for field in fields:
             field_name = field.targets[0].attr
             
             # Get dependencies and remove self reference if exists
@@ -445,45 +586,51 @@ class PullUpField(Refactor):
 
     def find_sibling_classes(self) -> list[ast.ClassDef]:
         """Find other classes that inherit from same superclass"""
-        siblings = []
         if not self.superclass:
-            return siblings
-            
-        for container in self.result.values():
-            for node in container.nodes:
-                if isinstance(node, ast.ClassDef):
-                    if any(
-                            container.lookup_alias(base) == self.superclass.name
-                            for base in get_str_bases(get_valid_bases(node))
-                    ):
-                        siblings.append(node)
-        return siblings
+            return []
+
+        return self._get_direct_subclasses(self.superclass)
 
     def is_field_in_parent(self, field_name: str) -> bool:
         """Check if field is already defined in parent class"""
         if not self.superclass:
             return False
             
-        checker = InstanceFieldOccurrenceChecker(field_name)
-        checker.visit(self.superclass)
-        return checker.defined
+        return self._is_field_defined_in(self.superclass, field_name)
 
-    def is_possible(self):
-        if not (len(self.fields) >= 1 and self.superclass):
+    @staticmethod
+    def _is_field_defined_in(class_node: ast.ClassDef, field_name: str) -> bool:
+        return get_class_usage(class_node).defines_field(field_name)
+
+    @classmethod
+    def _has_pullable_field(cls, fields: list[ast.Assign], superclass: ast.ClassDef | None) -> bool:
+        if not (len(fields) >= 1 and superclass):
             return False
 
-        independent_fields = self.get_independent_fields()
+        independent_fields = cls._get_independent_fields(fields)
         if not independent_fields:
             return False
 
         # Only check if field exists in parent
         for field in independent_fields:
-            field_name, _ = self.get_field_info(field)
-            if not self.is_field_in_parent(field_name):
+            field_name = field.targets[0].attr
+            if not cls._is_field_defined_in(superclass, field_name):
                 return True
                 
         return False
 
+    def is_possible(self):
+        return self._has_pullable_field(self.fields, self.superclass)
+
+    @classmethod
+    def _can_apply(cls, base, file_path, class_node):
+        fields = find_instance_fields(class_node.body)
+        if not fields:
+            return False
+
+        superclasses = get_superclasses(base, file_path, class_node)
+        return cls._has_pullable_field(fields, superclasses[0] if superclasses else None)
+
     def _do(self):
         independent_fields = self.get_independent_fields()
         field = choice(independent_fields)
@@ -511,10 +658,10 @@ class PullUpField(Refactor):
                 body=init_body,
                 decorator_list=[]
             )
-            self.superclass.body.insert(0, init_method)
+            self.journal.insert(self.superclass.body, 0, init_method)
         
         new_field = copy.deepcopy(field)
-        init_method.body.append(new_field)
+        self.journal.append(init_method.body, new_field)
         
         # Only remove field from siblings that have the same value
         siblings = self.find_sibling_classes()
@@ -531,12 +678,12 @@ class PullUpField(Refactor):
                         isinstance(stmt.targets[0], ast.Attribute) and
                         stmt.targets[0].attr == field_name and
                         ast.unparse(stmt.value) == field_value):
-                        sibling_init.body.remove(stmt)
+                        self.journal.remove(sibling_init.body, stmt)
 
 
 class DecreaseFieldAccess(Refactor):
-    def __init__(self, base: dict[str, NodeContainer], location):
-        super().__init__(base, location)
+    def __init__(self, base: dict[str, NodeContainer], location, in_place: bool = False):
+        super().__init__(base, location, in_place)
         self.fields = find_instance_fields(self.target_class_node.body)
         self.decreasable_fields = [
             field for field in self.fields
@@ -546,26 +693,34 @@ class DecreaseFieldAccess(Refactor):
     def is_possible(self):
         return len(self.decreasable_fields) >= 1
 
+    @classmethod
+    def _can_apply(cls, base, file_path, class_node):
+        return any(
+            not field.targets[0].attr.startswith("__")
+            for field in find_instance_fields(class_node.body)
+        )
+
     def _do(self):
         field_node = choice(self.decreasable_fields)
         old_name = field_node.targets[0].attr
         new_name = "_" + old_name
 
         # Update target class
-        update_field_references(self.target_class_node, old_name, new_name)
+        update_field_references(self.target_class_node, old_name, new_name, self.journal)
 
         # Update entire descendant chain until redefinitions
         update_descendant_chain(
             self.target_class_node, 
             old_name, 
             new_name, 
-            self.result
+            self.result,
+            self.journal
         )
 
 
 class IncreaseFieldAccess(Refactor):
-    def __init__(self, base: dict[str, NodeContainer], location):
-        super().__init__(base, location)
+    def __init__(self, base: dict[str, NodeContainer], location, in_place: bool = False):
+        super().__init__(base, location, in_place)
         self.fields = find_instance_fields(self.target_class_node.body)
         self.increasable_fields = [
             field for field in self.fields
@@ -575,28 +730,36 @@ class IncreaseFieldAccess(Refactor):
     def is_possible(self):
         return len(self.increasable_fields) >= 1
 
+    @classmethod
+    def _can_apply(cls, base, file_path, class_node):
+        return any(
+            field.targets[0].attr.startswith("_")
+            for field in find_instance_fields(class_node.body)
+        )
+
     def _do(self):
         field_node = choice(self.increasable_fields)
         old_name = field_node.targets[0].attr
         new_name = old_name[1:]  # Remove one underscore
 
         # Update target class
-        update_field_references(self.target_class_node, old_name, new_name)
+        update_field_references(self.target_class_node, old_name, new_name, self.journal)
 
         # Update entire descendant chain until redefinitions
         update_descendant_chain(
             self.target_class_node, 
             old_name, 
             new_name, 
-            self.result
+            self.result,
+            self.journal
         )
 
 
 
 ## Class Level Refactorings
 class ExtractHierarchy(Refactor):
-    def __init__(self, base: dict[str, NodeContainer], location):
-        super().__init__(base, location)
+    def __init__(self, base: dict[str, NodeContainer], location, in_place: bool = False):
+        super().__init__(base, location, in_place)
         # Track methods and fields for each subclass
         self.subclass_methods = {
             node: find_normal_methods(node.body) 
@@ -610,6 +773,10 @@ class ExtractHierarchy(Refactor):
     def is_possible(self):
         return len(self.subclasses) >= 2
 
+    @classmethod
+    def _can_apply(cls, base, file_path, class_node):
+        return len(get_subclasses(base, class_node.name)) >= 2
+
     def _do(self):
         # Find group of similar classes and their common features
         group, shared_methods, shared_fields = self._find_best_subclass_group()
@@ -623,7 +790,8 @@ class ExtractHierarchy(Refactor):
         
         # Add new class after target class
         target_idx = self.result[self.file_path].nodes.index(self.target_class_node)
-        self.result[self.file_path].nodes.insert(target_idx + 1, new_class)
+        self.result.insert_class(self.file_path, target_idx + 1, new_class, self.journal)
+        self.change_set.created.append((self.file_path, new_class_name))
 
         # Update each subclass in the group
         for subclass in group:
@@ -638,6 +806,7 @@ class ExtractHierarchy(Refactor):
 
             # Update inheritance
             self._update_inheritance(subclass, container, new_class_name) 
+            self._report_rebased(subclass, file_path)
             
             # Remove features that were moved to intermediate class
             self._remove_common_features(subclass, shared_methods, shared_fields)
@@ -688,7 +857,7 @@ class ExtractHierarchy(Refactor):
         methods2 = {m.name: m for m in self.subclass_methods[class2]}
         
         for name, method1 in methods1.items():
-            if name in methods2 and ast.dump(method1) == ast.dump(methods2[name]):
+            if name in methods2 and get_fingerprint(method1) == get_fingerprint(methods2[name]):
                 common_methods.append(method1)
 
         # Compare fields
@@ -696,7 +865,7 @@ class ExtractHierarchy(Refactor):
         fields2 = {f.targets[0].attr: f for f in self.subclass_fields[class2]}
         
         for name, field1 in fields1.items():
-            if name in fields2 and ast.dump(field1.value) == ast.dump(fields2[name].value):
+            if name in fields2 and get_fingerprint(field1.value) == get_fingerprint(fields2[name].value):
                 common_fields.append(field1)
 
         return len(common_methods) + len(common_fields), common_methods, common_fields
@@ -709,7 +878,7 @@ class ExtractHierarchy(Refactor):
         cls_methods = {m.name: m for m in self.subclass_methods[cls]}
         for method in methods:
             if (method.name in cls_methods and 
-                ast.dump(method) == ast.dump(cls_methods[method.name])):
+                get_fingerprint(method) == get_fingerprint(cls_methods[method.name])):
                 matches += 1
 
         # Check fields
@@ -717,7 +886,7 @@ class ExtractHierarchy(Refactor):
         for field in fields:
             field_name = field.targets[0].attr
             if (field_name in cls_fields and 
-                ast.dump(field.value) == ast.dump(cls_fields[field_name].value)):
+                get_fingerprint(field.value) == get_fingerprint(cls_fields[field_name].value)):
                 matches += 1
 
         return matches
@@ -754,7 +923,7 @@ class ExtractHierarchy(Refactor):
             decorator_list=[]
         )
 
-        return ast.fix_missing_locations(new_class)
+        return fix_missing_locations(new_class, self.journal)
 
     def _add_import(self, container: NodeContainer, class_name: str, file_path: str):
         """Add import statement if needed"""
@@ -771,27 +940,29 @@ class ExtractHierarchy(Refactor):
             names=[ast.alias(name=class_name, asname=None)],
             level=0
         )
-        container.nodes.insert(0, import_node)
+        container.insert_import(0, import_node, self.journal)
+        self.change_set.imported.append(file_path)
 
     def _update_inheritance(self, subclass: ast.ClassDef, container: NodeContainer, new_class_name: str):
         """Update the inheritance of a subclass"""
         for base in subclass.bases:
             if isinstance(base, ast.Name):
                 if container.lookup_alias(base.id) == self.target_class_node.name:
-                    base.id = new_class_name
+                    self.journal.set_attr(base, "id", new_class_name)
 
     def _remove_common_features(self, subclass: ast.ClassDef, methods: list, fields: list):
         """Remove features that were moved to intermediate class"""
         # Remove methods
         method_names = {m.name for m in methods}
-        subclass.body = [
+        method_fingerprints = {get_fingerprint(m) for m in methods}
+        self.journal.set_attr(subclass, "body", [
             node for node in subclass.body
             if not (
                 isinstance(node, ast.FunctionDef) and 
                 node.name in method_names and
-                any(ast.dump(node) == ast.dump(m) for m in methods)
+                get_fingerprint(node) in method_fingerprints
             )
-        ]
+        ])
 
         # Remove fields from __init__
         init_method = next(
@@ -799,41 +970,35 @@ class ExtractHierarchy(Refactor):
             None
         )
         if init_method:
-            field_info = {(f.targets[0].attr, ast.dump(f.value)) for f in fields}
-            init_method.body = [
+            field_info = {(f.targets[0].attr, get_fingerprint(f.value)) for f in fields}
+            self.journal.set_attr(init_method, "body", [
                 stmt for stmt in init_method.body
                 if not (
                     isinstance(stmt, ast.Assign) and
                     isinstance(stmt.targets[0], ast.Attribute) and
-                    (stmt.targets[0].attr, ast.dump(stmt.value)) in field_info
+                    (stmt.targets[0].attr, get_fingerprint(stmt.value)) in field_info
                 )
-            ]
+            ])
 
 class CollapseHierarchy(Refactor):
-    def __init__(self, base: dict[str, NodeContainer], location):
-        super().__init__(base, location)
+    def __init__(self, base: dict[str, NodeContainer], location, in_place: bool = False):
+        super().__init__(base, location, in_place)
         # Get target's immediate parent classes
         self.parent_classes = self._get_parent_classes()
         
     def _get_parent_classes(self) -> list[ast.ClassDef]:
         """Get immediate parent classes of target class"""
-        parents = []
-        base_names = [
-            self.target_node_container.lookup_alias(base)
-            for base in get_str_bases(get_valid_bases(self.target_class_node))
-        ]
-        
-        for container in self.result.values():
-            for node in container.nodes:
-                if isinstance(node, ast.ClassDef) and node.name in base_names:
-                    parents.append(node)
-        return parents
+        return get_superclasses(self.result, self.file_path, self.target_class_node)
 
     def is_possible(self) -> bool:
         """Check if hierarchy collapse is possible"""
         # Must have both parents and subclasses
         return len(self.parent_classes) >= 1 and len(self.subclasses) >= 1
 
+    @classmethod
+    def _can_apply(cls, base, file_path, class_node):
+        return len(get_superclasses(base, file_path, class_node)) >= 1 and len(get_subclasses(base, class_node.name)) >= 1
+
     def _update_inheritance(self, subclass: ast.ClassDef):
         """Update subclass to inherit from parent instead of target"""
         subclass_file, subclass_container = get_container_for_node(subclass, self.result)
@@ -872,14 +1037,17 @@ class CollapseHierarchy(Refactor):
                                 names=[ast.alias(name=parent_class.name, asname=None)],
                                 level=0
                             )
-                            subclass_container.nodes.insert(0, import_node)
+                            subclass_container.insert_import(0, import_node, self.journal)
+                            self.change_set.imported.append(subclass_file)
                             import_alias = parent_class.name
                         
                         # Update inheritance to use correct name/alias
-                        base.id = import_alias
+                        self.journal.set_attr(base, "id", import_alias)
                     else:
                         # Same file, use parent class name directly
-                        base.id = parent_class.name
+                        self.journal.set_attr(base, "id", parent_class.name)
+
+                    self._report_rebased(subclass, subclass_file)
 
     def _push_down_features(self, subclass: ast.ClassDef):
         """Push target's methods and fields to subclass if not already defined"""
@@ -887,20 +1055,21 @@ class CollapseHierarchy(Refactor):
         target_methods = find_normal_methods(self.target_class_node.body)
         for method in target_methods:
             if not method_exists_in_class(method, subclass):
-                subclass.body.append(copy.deepcopy(method))
+                self.journal.append(subclass.body, copy.deepcopy(method))
 
         # Push down fields
         target_fields = find_instance_fields(self.target_class_node.body)
         for field in target_fields:
             # Check if field exists or is used in subclass
             field_name = field.targets[0].attr
-            checker = InstanceFieldOccurrenceChecker(field_name)
-            checker.visit(subclass)
+            usage = get_class_usage(subclass)
             
-            if not checker.defined and checker.occurred:
+            if not usage.defines_field(field_name) and usage.uses_field(field_name):
                 # Use InitMethodInjector to properly add field
-                injector = InitMethodInjector(content=copy.deepcopy(field))
+                injector = InitMethodInjector(content=copy.deepcopy(field), journal=self.journal)
                 injector.visit(subclass)
+                # injector가 __init__을 직접 수정하므로 usage를 다시 만듦
+                invalidate_class_usage(subclass)
 
     def _do(self):
         """Perform the hierarchy collapse refactoring"""
@@ -913,14 +1082,15 @@ class CollapseHierarchy(Refactor):
             self._push_down_features(subclass)
 
             # Fix any missing locations in modified nodes
-            ast.fix_missing_locations(subclass)
+            fix_missing_locations(subclass, self.journal)
 
         # Remove the target class
-        self.result[self.file_path].nodes.remove(self.target_class_node)
+        self.result.remove_class(self.file_path, self.target_class_node, self.journal)
+        self.change_set.deleted.append((self.file_path, self.target_class_node.name))
 
 class MakeSuperclassAbstract(Refactor):
-    def __init__(self, base: dict[str, NodeContainer], location):
-        super().__init__(base, location)
+    def __init__(self, base: dict[str, NodeContainer], location, in_place: bool = False):
+        super().__init__(base, location, in_place)
 
         self.non_abstract_superclasses = [
             superclass
@@ -931,6 +1101,10 @@ class MakeSuperclassAbstract(Refactor):
     def is_possible(self):
         return len(self.non_abstract_superclasses) >= 1
 
+    @classmethod
+    def _can_apply(cls, base, file_path, class_node):
+        return any(not check_inherit_abc(superclass) for superclass in get_superclasses(base, file_path, class_node))
+
     def _do(self):
         superclass = choice(self.non_abstract_superclasses)
 
@@ -938,17 +1112,19 @@ class MakeSuperclassAbstract(Refactor):
         checker.visit(superclass)
 
         if checker.found:
-            superclass.bases.append(
+            self.journal.append(
+                superclass.bases,
                 ast.Name(
                     id="ABC",
                     ctx=ast.Load()
                 )
             )
+            self._report_rebased(superclass)
 
 
 class MakeSuperclassConcrete(Refactor):
-    def __init__(self, base: dict[str, NodeContainer], location):
-        super().__init__(base, location)
+    def __init__(self, base: dict[str, NodeContainer], location, in_place: bool = False):
+        super().__init__(base, location, in_place)
 
         self.abstract_superclasses = [
             superclass
@@ -959,6 +1135,10 @@ class MakeSuperclassConcrete(Refactor):
     def is_possible(self):
         return len(self.abstract_superclasses) >= 1
 
+    @classmethod
+    def _can_apply(cls, base, file_path, class_node):
+        return any(check_inherit_abc(superclass) for superclass in get_superclasses(base, file_path, class_node))
+
     def _do(self):
         superclass = choice(self.abstract_superclasses)
 
@@ -966,19 +1146,36 @@ class MakeSuperclassConcrete(Refactor):
         checker.visit(superclass)
 
         if not checker.found:
-            check_inherit_abc(superclass, remove_abc=True)
+            check_inherit_abc(superclass, remove_abc=True, journal=self.journal)
+            self._report_rebased(superclass)
 
 
 class ReplaceInheritanceWithDelegation(Refactor):
-    def __init__(self, base: dict[str, NodeContainer], location):
-        super().__init__(base, location)
+    def __init__(self, base: dict[str, NodeContainer], location, in_place: bool = False):
+        super().__init__(base, location, in_place)
 
 
     def is_possible(self):
         return len(self.superclasses) >= 1
 
+    @classmethod
+    def _can_apply(cls, base, file_path, class_node):
+        return len(get_superclasses(base, file_path, class_node)) >= 1
+
     def _do(self):
         superclass_expr = choice(get_valid_bases(self.target_class_node)) # this may be aliased
+
+        superclass_name = self.target_node_container.lookup_alias(list(get_str_bases([superclass_expr]))[0])
+        superclass_node = None
+        for superclass in self.superclasses:
+            if superclass.name == superclass_name:
+                superclass_node = superclass
+                break
+
+        if superclass_node is None:
+            # print("Cannot find superclass '%s' since it may be in dependency" % superclass_name)
+            return False
+
         delegate_attr_name = f"riwd_{ast.unparse(superclass_expr).replace('.', '_')}"
 
         # Create delegation
@@ -997,23 +1194,12 @@ class ReplaceInheritanceWithDelegation(Refactor):
             )
         )
 
-        init_method_injector = InitMethodInjector(content=assignment_node)
+        init_method_injector = InitMethodInjector(content=assignment_node, journal=self.journal)
         init_method_injector.visit(self.target_class_node)
 
         # Delete inheritance
-        self.target_class_node.bases.remove(superclass_expr)
-
-        superclass_name = self.target_node_container.lookup_alias(list(get_str_bases([superclass_expr]))[0])
-        superclass_node = None
-        for superclass in self.superclasses:
-            if superclass.name == superclass_name:
-                superclass_node = superclass
-                break
-
-        if superclass_node is None:
-            self.undo()
-            # print("Cannot find superclass '%s' since it may be in dependency" % superclass_name)
-            return
+        self.journal.remove(self.target_class_node.bases, superclass_expr)
+        self._report_rebased(self.target_class_node, self.file_path)
 
         superclass_methods = [method.name for method in find_normal_methods(superclass_node.body)]
         ignore_methods = [method.name for method in find_normal_methods(self.target_class_node.body)]
@@ -1035,49 +1221,56 @@ class ReplaceInheritanceWithDelegation(Refactor):
         replacer = SelfOccurrenceReplacer(
             methods_to_be_replaced,
             fields_to_be_replaced,
-            delegate_attr_name
+            delegate_attr_name,
+            self.journal
         )
         replacer.visit(self.target_class_node)
 
 
 class ReplaceDelegationWithInheritance(Refactor):
-    def __init__(self, base: dict[str, NodeContainer], location):
-        super().__init__(base, location)
+    def __init__(self, base: dict[str, NodeContainer], location, in_place: bool = False):
+        super().__init__(base, location, in_place)
 
-        self.delegations = []
-        self.target_class_init_method = None
-        for node in self.target_class_node.body:
-            if isinstance(node, ast.FunctionDef) and node.name == "__init__":
-                self.target_class_init_method = node
-                break
+        self.target_class_init_method = find_method_in_class("__init__", self.target_class_node)
+        self.delegations = self._find_delegations(self.result, self.file_path, self.target_class_init_method)
 
-        if self.target_class_init_method is not None:
-            for idx, stmt in enumerate(self.target_class_init_method.body):
+    @staticmethod
+    def _find_delegations(base: dict[str, NodeContainer], file_path: str, init_method: ast.FunctionDef | None):
+        delegations = []
+        if init_method is not None:
+            for idx, stmt in enumerate(init_method.body):
                 if isinstance(stmt, ast.Assign) and is_direct_self_attr(stmt.targets[0]) and isinstance(stmt.value, ast.Call):
                     class_expr = stmt.value.func
-                    class_name = self.target_node_container.lookup_alias(
+                    class_name = base[file_path].lookup_alias(
                         list(get_str_bases([class_expr]))[0]
                     )
-                    if class_name in self.class_names:
-                        self.delegations.append((idx, stmt.targets[0].attr, class_expr))
+                    if class_name in get_hierarchy_graph(base).classes:
+                        delegations.append((idx, stmt.targets[0].attr, class_expr))
+        return delegations
 
     def is_possible(self):
         return self.target_class_init_method is not None and len(self.delegations) >= 1
 
+    @classmethod
+    def _can_apply(cls, base, file_path, class_node):
+        init_method = find_method_in_class("__init__", class_node)
+        return init_method is not None and len(cls._find_delegations(base, file_path, init_method)) >= 1
+
     def _do(self):
         idx, attr, class_expr = choice(self.delegations)
 
         # delegation 제거
         if self.target_class_init_method:
-            self.target_class_init_method.body.pop(idx)
+            self.journal.pop(self.target_class_init_method.body, idx)
             if len(self.target_class_init_method.body) == 0:
-                self.target_class_init_method.body.append(ast.Pass())
+                self.journal.append(self.target_class_init_method.body, ast.Pass())
 
         # inheritance 추가
-        self.target_class_node.bases.append(class_expr)
+        self.journal.append(self.target_class_node.bases, class_expr)
+        self._report_rebased(self.target_class_node, self.file_path)
 
         # occurrence 찾아서 self.으로 변경
-        replacer = SelfAttributeOccurrenceReplacer(attr_name=attr)
+        replacer = SelfAttributeOccurrenceReplacer(attr_name=attr, journal=self.journal)
         replacer.visit(self.target_class_node)
 
 
@@ -0,0 +1,76 @@
+import copy
+from enum import Enum
+from typing import Type
+
+from src.core.parsing import NodeContainer, Library
+from src.core.refactor import Refactor, InvalidLocationException
+
+# (file_path, idx) 또는 class ID ("file_path:ClassName")
+Location = tuple[str, int] | str
+Series = list[tuple[Type[Refactor], Location]]
+
+
+class StepStatus(str, Enum):
+    APPLIED = "applied"
+    # is_possible()가 False
+    SKIPPED = "skipped"
+    # 앞의 refactoring들 때문에 location이 더 이상 class를 가리키지 않음
+    INVALID_LOCATION = "invalid location"
+
+
+class SeriesApplier:
+    """
+    Applies a series of refactorings step by step on a single working copy of the library.
+
+    The base is cloned once (or, with clone=False, modified directly and restored by undo()),
+    and every step runs in place on it, instead of copying the previous result per step.
+    """
+    def __init__(self, base: dict[str, NodeContainer], series: Series, clone: bool = True):
+        if not clone and not isinstance(base, Library):
+            raise TypeError("Applying a series without cloning requires a Library returned by parse_library")
+
+        self.base = base
+        self.series = list(series)
+        self.clone = clone
+
+        self.result: Library | None = None
+        self.statuses: list[StepStatus] = []
+        # {step index: exception}, INVALID_LOCATION인 step들
+        self.errors: dict[int, InvalidLocationException] = {}
+        # 적용된 refactoring들, 적용 순서대로
+        self.refactorings: list[Refactor] = []
+
+    def apply(self) -> Library:
+        if self.result is not None:
+            raise RuntimeError("The series is already applied")
+
+        self.result = Library(copy.deepcopy(dict(self.base))) if self.clone else self.base
+
+        for step_idx, (refactoring_type, location) in enumerate(self.series):
+            try:
+                refactor = refactoring_type(base=self.result, location=location, in_place=True)
+            except InvalidLocationException as e:
+                self.statuses.append(StepStatus.INVALID_LOCATION)
+                self.errors[step_idx] = e
+                continue
+
+            if refactor.do():
+                self.statuses.append(StepStatus.APPLIED)
+                self.refactorings.append(refactor)
+            else:
+                self.statuses.append(StepStatus.SKIPPED)
+
+        return self.result
+
+    def undo(self):
+        """Roll back the applied steps in reverse order, restores the base if clone is False"""
+        for refactor in reversed(self.refactorings):
+            refactor.undo()
+
+        self.result = None
+        self.statuses = []
+        self.errors = {}
+        self.refactorings = []
+
+    def get_steps(self, status: StepStatus) -> list[int]:
+        return [step_idx for step_idx, step_status in enumerate(self.statuses) if step_status == status]
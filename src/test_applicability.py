@@ -0,0 +1,47 @@
+import random
+
+import pytest
+
+from src.core.applicability import ApplicabilityIndex
+from src.core.parsing import parse_library, get_class_locations
+from src.core.refactor import REFACTORING_TYPES
+from src.test_refactor_undo import library_path  # noqa: F401 (pytest fixture)
+
+
+def test_update_matches_rebuilt_index_after_each_refactoring(library_path):
+    library = parse_library(library_path)
+    index = ApplicabilityIndex(library)
+    updated = 0
+
+    for class_id in get_class_locations(library, as_ids=True):
+        for refactoring_type in REFACTORING_TYPES:
+            random.seed(0)
+            refactor = refactoring_type(base=library, location=class_id, in_place=True)
+            if refactor.do():
+                index.update(refactor.change_set)
+                updated += 1
+                assert index.feasible_types == ApplicabilityIndex(library).feasible_types, (refactoring_type.__name__, class_id)
+
+                # 다음 pair는 원래 library에서 확인
+                refactor.undo()
+                index = ApplicabilityIndex(library)
+
+    assert updated > 0
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_update_matches_rebuilt_index_after_kept_series(library_path, seed):
+    library = parse_library(library_path)
+    index = ApplicabilityIndex(library)
+
+    random.seed(seed)
+    for _ in range(20):
+        candidates = index.candidates()
+        if not candidates:
+            break
+
+        class_id, refactoring_type = random.choice(candidates)
+        refactor = refactoring_type(base=library, location=class_id, in_place=True)
+        if refactor.do():
+            index.update(refactor.change_set)
+        assert index.feasible_types == ApplicabilityIndex(library).feasible_types
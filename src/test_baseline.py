@@ -0,0 +1,31 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import baseline
+import constant
+from constant import Library_Name
+
+REPOSITORY_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class RecordingExecutor(ProcessPoolExecutor):
+    max_workers_used = []
+
+    def __init__(self, max_workers=None, *args, **kwargs):
+        RecordingExecutor.max_workers_used.append(max_workers)
+        super().__init__(max_workers, *args, **kwargs)
+
+
+def test_all_baselines_use_worker_processes_by_default(monkeypatch):
+    # Target_Library_Path는 repository 기준 상대 경로
+    monkeypatch.chdir(REPOSITORY_PATH)
+    monkeypatch.setattr(constant, "PARSE_CACHE_DIR", None)
+    monkeypatch.setattr(baseline, "ProcessPoolExecutor", RecordingExecutor)
+    RecordingExecutor.max_workers_used.clear()
+
+    baselines = baseline.calculate_all_baselines()
+
+    assert RecordingExecutor.max_workers_used == [constant.BASELINE_WORKERS]
+    assert list(baselines) == list(Library_Name)
+    assert baselines == baseline.calculate_all_baselines(workers=None)
+    assert baselines[Library_Name.ASCIIMatics] is not None
@@ -0,0 +1,168 @@
+import ast
+import random
+import textwrap
+
+import pytest
+
+from src.core.parsing import parse_library, get_class_locations
+from src.core.refactor import REFACTORING_TYPES
+from src.core.series import SeriesApplier, StepStatus
+
+# 모든 refactoring type이 적어도 한 번은 적용되도록 만든 작은 library
+LIBRARY_FILES = {
+    "base.py": '''
+        from abc import ABC, abstractmethod
+
+
+        class Shape:
+            def __init__(self):
+                self.name = "shape"
+                self._color = "red"
+
+            def describe(self):
+                return self.name
+
+            def _scale(self, factor):
+                return factor
+
+
+        class Template:
+            @abstractmethod
+            def render(self):
+                ...
+
+
+        class Abstract(ABC):
+            def __init__(self):
+                self.value = 1
+
+            def compute(self):
+                return self.value
+
+
+        class Helper:
+            def __init__(self):
+                self.count = 0
+
+            def help(self):
+                return self.count
+    ''',
+    "shapes.py": '''
+        from base import Shape as BaseShape, Template, Abstract, Helper
+
+
+        class Square(BaseShape, Template):
+            def __init__(self):
+                super().__init__()
+                self.side = 1
+                self.__secret = 2
+
+            def describe(self):
+                return self.name
+
+            def perimeter(self):
+                return self.side * self._scale(4) + self.__secret
+
+            def render(self):
+                return self._color
+
+
+        class Circle(BaseShape):
+            def __init__(self):
+                super().__init__()
+                self.side = 1
+                self.helper = Helper()
+
+            def describe(self):
+                return self.name
+
+            def helped(self):
+                return self.helper.help() + self.helper.count
+
+
+        class Ring(Circle):
+            def inner(self):
+                return self.describe() + self._color
+
+
+        class Concrete(Abstract):
+            def compute(self):
+                return self.value * 2
+    ''',
+}
+
+
+@pytest.fixture
+def library_path(tmp_path):
+    for file_name, code in LIBRARY_FILES.items():
+        (tmp_path / file_name).write_text(textwrap.dedent(code), encoding="utf-8")
+    return str(tmp_path)
+
+
+def get_library_state(library):
+    """Everything an in-place undo must restore, with list and dict order"""
+    return {
+        "containers": [
+            (
+                file_path,
+                [ast.dump(node, include_attributes=True) for node in node_container.nodes],
+                [ast.dump(alias) for alias in node_container.aliases],
+                list(node_container.alias_map.items()),
+                list(node_container.inheritance_dict.items()),
+            )
+            for file_path, node_container in library.items()
+        ],
+        "class_locations": list(library.class_index.locations.items()),
+        "class_base_names": list(library.class_index.base_names.items()),
+        "class_referrers": library.class_index.referrers,
+        "hierarchy_ranks": list(library.hierarchy.ranks.items()),
+        "hierarchy_parents": list(library.hierarchy.parents.items()),
+        "hierarchy_children": library.hierarchy.children,
+        "hierarchy_classes": library.hierarchy.classes,
+        # class ID가 container의 몇 번째 node 객체를 가리키는지
+        "class_nodes": [
+            (class_id, _index_of(library[class_id.rsplit(":", 1)[0]].nodes, class_node))
+            for class_id, class_node in library.class_nodes.items()
+        ],
+    }
+
+
+def _index_of(nodes, target_node):
+    return next((idx for idx, node in enumerate(nodes) if node is target_node), None)
+
+
+def test_undo_restores_library(library_path):
+    library = parse_library(library_path)
+    initial_state = get_library_state(library)
+    applied_types = set()
+
+    for location in get_class_locations(library):
+        for refactoring_type in REFACTORING_TYPES:
+            for seed in range(3):
+                random.seed(seed)
+                refactor = refactoring_type(base=library, location=location, in_place=True)
+                if refactor.do():
+                    applied_types.add(refactoring_type)
+                refactor.undo()
+
+                assert get_library_state(library) == initial_state, (refactoring_type.__name__, location, seed)
+
+    assert get_library_state(parse_library(library_path)) == initial_state
+    assert applied_types == set(REFACTORING_TYPES)
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_series_applier_undo_restores_library(library_path, seed):
+    library = parse_library(library_path)
+    initial_state = get_library_state(library)
+
+    random.seed(seed)
+    class_ids = get_class_locations(library, as_ids=True)
+    series = [(random.choice(REFACTORING_TYPES), random.choice(class_ids)) for _ in range(20)]
+
+    applier = SeriesApplier(library, series, clone=False)
+    assert applier.apply() is library
+    assert applier.get_steps(StepStatus.APPLIED)
+
+    applier.undo()
+    assert get_library_state(library) == initial_state
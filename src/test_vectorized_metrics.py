@@ -0,0 +1,38 @@
+import os
+
+import pytest
+
+import constant
+from constant import Library_Name
+from eval import vectorized_metrics
+from evaluation import evaluate_metrics
+from main import get_all_metric_types
+from src.core.parsing import parse_library
+from src.test_refactor_undo import library_path  # noqa: F401 (pytest fixture)
+
+REPOSITORY_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def get_results(library, engine):
+    # cache를 끄지 않으면 먼저 계산한 engine의 값을 그대로 돌려받음
+    evaluations = evaluate_metrics(library, get_all_metric_types(), engine=engine, cache=None)
+    return {metric_type: evaluation.result for metric_type, evaluation in evaluations.items()}
+
+
+@pytest.mark.parametrize("library_name", [None, Library_Name.ASCIIMatics])
+def test_numpy_engine_matches_python_engine(monkeypatch, library_path, library_name):
+    pytest.importorskip("numpy")
+    if library_name is not None:
+        monkeypatch.chdir(REPOSITORY_PATH)
+        monkeypatch.setattr(constant, "PARSE_CACHE_DIR", None)
+        library_path = constant.Target_Library_Path(library_name)
+    library = parse_library(library_path)
+
+    assert get_results(library, "numpy") == get_results(library, "python")
+
+
+def test_numpy_engine_without_numpy_raises(monkeypatch, library_path):
+    monkeypatch.setattr(vectorized_metrics, "np", None)
+
+    with pytest.raises(ImportError, match="METRIC_ENGINE"):
+        evaluate_metrics(parse_library(library_path), get_all_metric_types(), engine="numpy", cache=None)
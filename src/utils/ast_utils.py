@@ -1,8 +1,10 @@
 import ast
+import hashlib
 # Add src. when merging
 from ast import ClassDef, FunctionDef, Assign, Attribute, Name
 
-from src.core.parsing import NodeContainer
+from src.core.journal import Journal, NULL_JOURNAL
+from src.core.parsing import NodeContainer, get_subclasses, ENCODING
 
 
 # Utility functions
@@ -38,7 +40,7 @@ def class_redefines_field(class_node: ClassDef, field_name: str) -> bool:
                     return True
     return False
 
-def update_field_references(class_node: ClassDef, old_name: str, new_name: str):
+def update_field_references(class_node: ClassDef, old_name: str, new_name: str, journal: Journal = NULL_JOURNAL):
     """Update all references to the field in a class's methods"""
     for node in class_node.body:
         if isinstance(node, FunctionDef):
@@ -47,22 +49,13 @@ def update_field_references(class_node: ClassDef, old_name: str, new_name: str):
                     isinstance(stmt.value, Name) and
                     stmt.value.id == 'self' and 
                     stmt.attr == old_name):
-                    stmt.attr = new_name
+                    journal.set_attr(stmt, "attr", new_name)
 
 def get_all_subclasses(class_node: ClassDef, containers: dict[str, NodeContainer]) -> list[ClassDef]:
     """Get all direct subclasses from any file in the project"""
-    subclasses = []
-    for container in containers.values():
-        for node in container.nodes:
-            if isinstance(node, ClassDef):
-                if any(
-                    container.lookup_alias(base) == class_node.name
-                    for base in get_str_bases(get_valid_bases(node))
-                ):
-                    subclasses.append(node)
-    return subclasses
-
-def update_descendant_chain(class_node: ClassDef, old_name: str, new_name: str, containers: dict[str, NodeContainer]):
+    return get_subclasses(containers, class_node.name)
+
+def update_descendant_chain(class_node: ClassDef, old_name: str, new_name: str, containers: dict[str, NodeContainer], journal: Journal = NULL_JOURNAL):
     """Recursively update field references in descendants until a redefinition is found"""
     subclasses = get_all_subclasses(class_node, containers)
     
@@ -70,8 +63,8 @@ def update_descendant_chain(class_node: ClassDef, old_name: str, new_name: str,
         if class_redefines_field(subclass, old_name):
             continue
         
-        update_field_references(subclass, old_name, new_name)
-        update_descendant_chain(subclass, old_name, new_name, containers)
+        update_field_references(subclass, old_name, new_name, journal)
+        update_descendant_chain(subclass, old_name, new_name, containers, journal)
 
 def create_super_init_call() -> ast.Expr:
     """Create ast node for super().__init__() call"""
@@ -151,7 +144,7 @@ def is_direct_self_attr(node: ast.expr):
     return isinstance(node, ast.Attribute) and isinstance(node.value, ast.Name) and node.value.id == "self"
 
 
-def check_inherit_abc(node: ast.ClassDef, remove_abc: bool = False):
+def check_inherit_abc(node: ast.ClassDef, remove_abc: bool = False, journal: Journal = NULL_JOURNAL):
     result = False
 
     abc_base_idx = -1
@@ -183,9 +176,9 @@ def check_inherit_abc(node: ast.ClassDef, remove_abc: bool = False):
 
     if remove_abc:
         if abc_base_idx != -1:
-            node.bases.pop(abc_base_idx)
+            journal.pop(node.bases, abc_base_idx)
         if abc_keyword_idx != -1:
-            node.keywords.pop(abc_keyword_idx)
+            journal.pop(node.keywords, abc_keyword_idx)
 
     return result
 
@@ -249,29 +242,53 @@ def is_property_decorated_method(node: ast.FunctionDef):
         if isinstance(decorator, ast.Name)
     )
 
-def check_nodes_equal(node1, node2):
-    if type(node1) != type(node2):
-        return False
-
-    if not hasattr(node1, "_fields"):
-        return node1 == node2
 
-    for field in node1._fields:
-        value1 = getattr(node1, field)
-        value2 = getattr(node2, field)
-
-        if isinstance(value1, list):
-            if len(value1) != len(value2):
-                return False
-
-            for v1, v2 in zip(value1, value2):
-                if not check_nodes_equal(v1, v2):
-                    return False
-        else:
-            if not check_nodes_equal(value1, value2):
-                return False
-
-    return True
+def get_fingerprint(node: ast.AST | None) -> bytes | None:
+    """Structural hash of node (same as comparing ast.dump), cached on the node"""
+    if node is None:
+        return None
+
+    fingerprint = node.__dict__.get("_fingerprint")
+    if fingerprint is None:
+        fingerprint = hashlib.blake2b(ast.dump(node).encode(ENCODING), digest_size=16).digest()
+        node._fingerprint = fingerprint
+    return fingerprint
+
+
+def invalidate_fingerprints(node: ast.AST):
+    """Drop the cached fingerprints of node and its children, must be called after node is mutated"""
+    for child in ast.walk(node):
+        child.__dict__.pop("_fingerprint", None)
+
+
+def fix_missing_locations(node: ast.AST, journal: Journal = NULL_JOURNAL) -> ast.AST:
+    """ast.fix_missing_locations, recording the positions it fills in so that undo can drop them"""
+    def _fix(node, lineno, col_offset, end_lineno, end_col_offset):
+        if "lineno" in node._attributes:
+            if not hasattr(node, "lineno"):
+                journal.set_attr(node, "lineno", lineno)
+            else:
+                lineno = node.lineno
+        if "end_lineno" in node._attributes:
+            if getattr(node, "end_lineno", None) is None:
+                journal.set_attr(node, "end_lineno", end_lineno)
+            else:
+                end_lineno = node.end_lineno
+        if "col_offset" in node._attributes:
+            if not hasattr(node, "col_offset"):
+                journal.set_attr(node, "col_offset", col_offset)
+            else:
+                col_offset = node.col_offset
+        if "end_col_offset" in node._attributes:
+            if getattr(node, "end_col_offset", None) is None:
+                journal.set_attr(node, "end_col_offset", end_col_offset)
+            else:
+                end_col_offset = node.end_col_offset
+        for child in ast.iter_child_nodes(node):
+            _fix(child, lineno, col_offset, end_lineno, end_col_offset)
+
+    _fix(node, 1, 0, 1, 0)
+    return node
 
 
 def check_functions_equal(node1: ast.FunctionDef, node2: ast.FunctionDef):
@@ -279,17 +296,17 @@ def check_functions_equal(node1: ast.FunctionDef, node2: ast.FunctionDef):
         return False
 
     for body1, body2 in zip(node1.body, node2.body):
-        if not check_nodes_equal(body1, body2):
+        if get_fingerprint(body1) != get_fingerprint(body2):
             return False
 
     for decorator1, decorator2 in zip(node1.decorator_list, node2.decorator_list):
-        if not check_nodes_equal(decorator1, decorator2):
+        if get_fingerprint(decorator1) != get_fingerprint(decorator2):
             return False
 
-    if not check_nodes_equal(node1.args, node2.args):
+    if get_fingerprint(node1.args) != get_fingerprint(node2.args):
         return False
 
-    if not check_nodes_equal(node1.returns, node2.returns):
+    if get_fingerprint(node1.returns) != get_fingerprint(node2.returns):
         return False
 
     if node1.type_comment != node2.type_comment:
@@ -307,35 +324,67 @@ def is_pass_like_node(node: ast.AST):
         return False
 
 
-def add_method_to_class(class_node: ast.ClassDef, method_node: ast.FunctionDef):
-    class_node.body.append(method_node)
+def add_method_to_class(class_node: ast.ClassDef, method_node: ast.FunctionDef, journal: Journal = NULL_JOURNAL):
+    journal.append(class_node.body, method_node)
 
-    class_node.body = [
+    journal.set_attr(class_node, "body", [
         node
         for node in class_node.body
         if not is_pass_like_node(node)
-    ]
+    ])
 
 
-def delete_method_from_class(class_node: ast.ClassDef, method_node: ast.FunctionDef):
+def delete_method_from_class(class_node: ast.ClassDef, method_node: ast.FunctionDef, journal: Journal = NULL_JOURNAL):
     for idx, node in enumerate(class_node.body):
         if isinstance(node, ast.FunctionDef) and node.name == method_node.name:
-            class_node.body.pop(idx)
+            journal.pop(class_node.body, idx)
             break
 
     if len(class_node.body) == 0:
-        class_node.body.append(ast.Pass())
-
-
-class MethodRenamer(ast.NodeTransformer):
-    def __init__(self, old_name: str, new_name: str, as_property: bool = False):
+        journal.append(class_node.body, ast.Pass())
+
+
+class JournaledTransformer(ast.NodeTransformer):
+    """NodeTransformer which records every field it changes in the given journal"""
+    def __init__(self, journal: Journal = NULL_JOURNAL):
+        self.journal = journal
+
+    def generic_visit(self, node):
+        for field, old_value in ast.iter_fields(node):
+            if isinstance(old_value, list):
+                new_values = []
+                for value in old_value:
+                    if isinstance(value, ast.AST):
+                        value = self.visit(value)
+                        if value is None:
+                            continue
+                        elif not isinstance(value, ast.AST):
+                            new_values.extend(value)
+                            continue
+                    new_values.append(value)
+
+                # 실제로 바뀐 list만 기록
+                if len(new_values) != len(old_value) or any(new is not old for new, old in zip(new_values, old_value)):
+                    self.journal.replace_list(old_value, new_values)
+            elif isinstance(old_value, ast.AST):
+                new_node = self.visit(old_value)
+                if new_node is None:
+                    self.journal.del_attr(node, field)
+                elif new_node is not old_value:
+                    self.journal.set_attr(node, field, new_node)
+        return node
+
+
+class MethodRenamer(JournaledTransformer):
+    def __init__(self, old_name: str, new_name: str, as_property: bool = False, journal: Journal = NULL_JOURNAL):
+        super().__init__(journal)
         self.old_name = old_name
         self.new_name = new_name
         self.as_property = as_property
 
     def visit_FunctionDef(self, node):
         if node.name == self.old_name:
-            node.name = self.new_name
+            self.journal.set_attr(node, "name", self.new_name)
 
         return self.generic_visit(node)
 
@@ -343,86 +392,123 @@ class MethodRenamer(ast.NodeTransformer):
         if not self.as_property:
             if isinstance(node.func, ast.Attribute):
                 if node.func.attr == self.old_name:
-                    node.func.attr = self.new_name
+                    self.journal.set_attr(node.func, "attr", self.new_name)
         return self.generic_visit(node)
 
     def visit_Attribute(self, node):
         if self.as_property:
             if is_direct_self_attr(node) and node.attr == self.old_name:
-                node.attr = self.new_name
+                self.journal.set_attr(node, "attr", self.new_name)
         return self.generic_visit(node)
 
 
-class MethodOccurrenceChecker(ast.NodeVisitor):
-    def __init__(self, method_name: str, as_property: bool = False):
-        self.method_name = method_name
-        self.as_property = as_property
-        self.occurred = False
-        self.defined = False
+class _UsageCollector(ast.NodeVisitor):
+    def __init__(self):
+        # [(kind, name, site)]
+        self.entries = []
 
     def visit_FunctionDef(self, node):
-        if not self.defined and node.name == self.method_name:
-            self.defined = True
+        self.entries.append(("method", node.name, node))
+        if node.name == "__init__":
+            for stmt in node.body:
+                if isinstance(stmt, ast.Assign):
+                    for target in stmt.targets:
+                        if is_direct_self_attr(target):
+                            self.entries.append(("field", target.attr, stmt))
         self.generic_visit(node)
 
     def visit_Call(self, node):
-        if not self.as_property:
-            if not self.occurred and is_direct_self_attr(node.func) and node.func.attr == self.method_name:
-                    self.occurred = True
+        if is_direct_self_attr(node.func):
+            self.entries.append(("call", node.func.attr, node))
         self.generic_visit(node)
 
     def visit_Attribute(self, node):
-        if self.as_property:
-            if not self.occurred and is_direct_self_attr(node) and node.attr == self.method_name:
-                self.occurred = True
+        if is_direct_self_attr(node):
+            self.entries.append(("attribute", node.attr, node))
         self.generic_visit(node)
 
 
-# This checks the occurrence of callings of method in the class
-class MethodSelfOccurrenceChecker(ast.NodeVisitor):
-    def __init__(self, method_name: str):
-        self.method_name = method_name
-        self.occurred = False
+class ClassUsage:
+    """
+    Methods and self attributes defined and used in the body of a class, with their sites.
+    Each top-level statement of the body is traversed once; statements added to or removed from
+    the body are picked up by sync(), but a statement mutated in place needs invalidate_class_usage.
 
-    def visit_Call(self, node):
-        if not self.occurred and is_direct_self_attr(node.func) and node.func.attr == self.method_name:
-            self.occurred = True
-        self.generic_visit(node)
+    kinds: "method" (FunctionDef at any depth), "field" (self.x = ... directly in an __init__),
+    "call" (self.x(...)) and "attribute" (self.x)
+    """
+    def __init__(self):
+        # {id(statement): (statement, [(kind, name, site)])}, statement을 잡고 있어서 id가 재사용되지 않음
+        self.statements: dict[int, tuple[ast.stmt, list]] = {}
+        # {kind: {name: [(statement, site)]}}
+        self.sites: dict[str, dict[str, list]] = {"method": {}, "field": {}, "call": {}, "attribute": {}}
+
+    def __deepcopy__(self, memo):
+        # clone된 class는 statement들이 모두 새 객체이므로 빈 상태에서 다시 채움
+        return ClassUsage()
+
+    def sync(self, class_node: ast.ClassDef):
+        body_ids = {id(stmt) for stmt in class_node.body}
+        for statement_id in [statement_id for statement_id in self.statements if statement_id not in body_ids]:
+            self._remove_statement(statement_id)
+
+        for stmt in class_node.body:
+            if id(stmt) not in self.statements:
+                self._add_statement(stmt)
+
+    def _add_statement(self, stmt: ast.stmt):
+        collector = _UsageCollector()
+        collector.visit(stmt)
+        self.statements[id(stmt)] = (stmt, collector.entries)
+        for kind, name, site in collector.entries:
+            self.sites[kind].setdefault(name, []).append((stmt, site))
+
+    def _remove_statement(self, statement_id: int):
+        stmt, entries = self.statements.pop(statement_id)
+        for kind, name in {(kind, name) for kind, name, _ in entries}:
+            sites = [item for item in self.sites[kind][name] if item[0] is not stmt]
+            if sites:
+                self.sites[kind][name] = sites
+            else:
+                del self.sites[kind][name]
+
+    def defines_method(self, method_name: str) -> bool:
+        return method_name in self.sites["method"]
+
+    def uses_method(self, method_name: str, as_property: bool = False) -> bool:
+        # property는 self.x, 일반 method는 self.x(...) 호출
+        return method_name in self.sites["attribute" if as_property else "call"]
+
+    def defines_field(self, field_name: str) -> bool:
+        return field_name in self.sites["field"]
+
+    def uses_field(self, field_name: str) -> bool:
+        return field_name in self.sites["attribute"]
+
+    def uses_field_outside_init(self, field_name: str) -> bool:
+        return any(
+            isinstance(stmt, ast.FunctionDef) and stmt.name != "__init__"
+            for stmt, _ in self.sites["attribute"].get(field_name, [])
+        )
 
 
+def get_class_usage(class_node: ast.ClassDef) -> ClassUsage:
+    """ClassUsage of class_node, cached on the node"""
+    usage = class_node.__dict__.get("_usage")
+    if usage is None:
+        usage = ClassUsage()
+        class_node._usage = usage
+    usage.sync(class_node)
+    return usage
 
-class InstanceFieldOccurrenceChecker(ast.NodeVisitor):
-    def __init__(self, field_name: str):
-        self.field_name = field_name
-        self.occurred = False  # Field is used
-        self.defined = False   # Field is defined in __init__
 
-    def visit_FunctionDef(self, node):
-        if node.name == "__init__":
-            for stmt in node.body:
-                if isinstance(stmt, ast.Assign):
-                    for target in stmt.targets:
-                        # For __init__, we check for definitions
-                        if self.is_self_attr(target):
-                            self.defined = True
-        self.generic_visit(node)
-
-    def visit_Attribute(self, node):
-        # For any attribute access, we check for usage
-        if self.is_self_attr(node):
-            self.occurred = True
-        self.generic_visit(node)
-        
-    def is_self_attr(self, node):
-        """Check if node is self.field_name"""
-        return (isinstance(node, ast.Attribute) and 
-                isinstance(node.value, ast.Name) and 
-                node.value.id == 'self' and 
-                node.attr == self.field_name)
+def invalidate_class_usage(class_node: ast.ClassDef):
+    class_node.__dict__.pop("_usage", None)
 
 
-class InitMethodInjector(ast.NodeTransformer):
-    def __init__(self, content: ast.Assign):
+class InitMethodInjector(JournaledTransformer):
+    def __init__(self, content: ast.Assign, journal: Journal = NULL_JOURNAL):
+        super().__init__(journal)
         if not isinstance(content, ast.Assign):
             raise Exception(f"The content of init method must be an assignment, but {type(content)} is given")
 
@@ -433,7 +519,7 @@ class InitMethodInjector(ast.NodeTransformer):
         for item in node.body:
             if isinstance(item, ast.FunctionDef) and item.name == "__init__":
                 has_init_method = True
-                item.body.append(self.content)
+                self.journal.append(item.body, self.content)
                 break
 
         if not has_init_method:
@@ -449,15 +535,16 @@ class InitMethodInjector(ast.NodeTransformer):
                 body=[self.content],
                 decorator_list=[]
             )
-            node.body.insert(0, init_method)
+            self.journal.insert(node.body, 0, init_method)
 
-        ast.fix_missing_locations(node)
+        fix_missing_locations(node, self.journal)
 
         return self.generic_visit(node)
 
 
-class SelfAttributeOccurrenceReplacer(ast.NodeTransformer):
-    def __init__(self, attr_name: str):
+class SelfAttributeOccurrenceReplacer(JournaledTransformer):
+    def __init__(self, attr_name: str, journal: Journal = NULL_JOURNAL):
+        super().__init__(journal)
         self.attr_name = attr_name
 
     def visit_Attribute(self, node):
@@ -470,8 +557,9 @@ class SelfAttributeOccurrenceReplacer(ast.NodeTransformer):
 # With given attr_name
 # Replace occurrences like self.a, self.foo()
 # to self.{attr_name}.a, self.{attr_name}.foo()
-class SelfOccurrenceReplacer(ast.NodeTransformer):
-    def __init__(self, methods_to_be_replaced: list[str], fields_to_be_replaced: list[str], attr_name: str):
+class SelfOccurrenceReplacer(JournaledTransformer):
+    def __init__(self, methods_to_be_replaced: list[str], fields_to_be_replaced: list[str], attr_name: str, journal: Journal = NULL_JOURNAL):
+        super().__init__(journal)
         self.methods_to_be_replaced = methods_to_be_replaced
         self.fields_to_be_replaced = fields_to_be_replaced
         self.attr_name = attr_name
@@ -479,21 +567,21 @@ class SelfOccurrenceReplacer(ast.NodeTransformer):
     def visit_Attribute(self, node):
         # self.a -> self.{attr_name}.a
         if is_direct_self_attr(node) and node.attr in self.fields_to_be_replaced:
-            node.value = ast.Attribute(
+            self.journal.set_attr(node, "value", ast.Attribute(
                 value=ast.Name(id='self', ctx=ast.Load()),
                 attr=self.attr_name,
                 ctx=ast.Load()
-            )
+            ))
         return self.generic_visit(node)
 
     def visit_Call(self, node):
         # self.foo() -> self.{attr_name}.foo()
         if is_direct_self_attr(node.func) and node.func.attr in self.methods_to_be_replaced:
-            node.func.value = ast.Attribute(
+            self.journal.set_attr(node.func, "value", ast.Attribute(
                 value=ast.Name(id='self', ctx=ast.Load()),
                 attr=self.attr_name,
                 ctx=ast.Load()
-            )
+            ))
         return self.generic_visit(node)
 
 